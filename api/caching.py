@@ -0,0 +1,108 @@
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+
+from graphql import parse, get_operation_ast, FieldNode, GraphQLError
+
+
+def parse_max_ages(value):
+    """
+    Parse the cache lifetimes of the cacheable root fields.
+
+    Parameters:
+        value (str): Comma separated "field=seconds" pairs, e.g. "allExercises=3600,allPoses=3600".
+
+    Returns:
+        dict: The max-age in seconds by root field name.
+    """
+    max_ages = {}
+    for pair in value.split(","):
+        if pair.strip():
+            field, seconds = pair.split("=")
+            max_ages[field.strip()] = int(seconds)
+    return max_ages
+
+
+def root_fields(query, operation_name=None):
+    """
+    Get the names of the root fields selected by a query operation.
+
+    Parameters:
+        query (str): The GraphQL document.
+        operation_name (str, optional): The name of the operation to execute. Defaults to None.
+
+    Returns:
+        List[str]: The root field names, or None if they cannot be determined statically.
+    """
+    try:
+        operation = get_operation_ast(parse(query), operation_name)
+    except GraphQLError:
+        return None
+    if operation is None:
+        return None
+
+    fields = []
+    for selection in operation.selection_set.selections:
+        # Fragments and directives could hide other fields, don't try to cache them
+        if not isinstance(selection, FieldNode) or selection.directives:
+            return None
+        fields.append(selection.name.value)
+    return fields
+
+
+def cache_control(fields, max_ages):
+    """
+    Get the Cache-Control header of a query operation.
+
+    Only operations selecting catalog fields exclusively are cacheable, for the shortest
+    lifetime configured for their fields.
+
+    Parameters:
+        fields (List[str]): The root fields of the operation, or None.
+        max_ages (dict): The max-age in seconds by cacheable root field name.
+
+    Returns:
+        str: The Cache-Control header, or None if the operation must not be cached.
+    """
+    if not fields:
+        return None
+    catalog_fields = [field for field in fields if field != "__typename"]
+    if not catalog_fields or any(field not in max_ages for field in catalog_fields):
+        return None
+    return f"public, max-age={min(max_ages[field] for field in catalog_fields)}"
+
+
+def make_etag(version, query, variables, operation_name):
+    """
+    Compute the strong ETag of a catalog query for a catalog version.
+
+    Returns:
+        str: The ETag, without quotes.
+    """
+    key = json.dumps([version, query, variables, operation_name], sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+### Encoded responses by ETag
+class ResponseCache:
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag):
+        with self._lock:
+            body = self._responses.get(etag)
+            if body is not None:
+                self._responses.move_to_end(etag)
+            return body
+
+    def set(self, etag, body):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._responses[etag] = body
+            self._responses.move_to_end(etag)
+            while len(self._responses) > self.max_size:
+                self._responses.popitem(last=False)
@@ -0,0 +1,97 @@
+import gzip
+
+from flask import request, current_app
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _gzip(data, config):
+    return gzip.compress(data, compresslevel=config["COMPRESSION_GZIP_LEVEL"])
+
+
+def _brotli(data, config):
+    return brotli.compress(data, quality=config["COMPRESSION_BROTLI_QUALITY"])
+
+
+COMPRESSORS = {
+    "gzip": _gzip,
+    "br": _brotli,
+}
+
+
+def available_algorithms(config):
+    """
+    Get the configured compression algorithms that can be used in this environment.
+
+    Parameters:
+        config (dict): The Flask app configuration.
+
+    Returns:
+        List[str]: The content codings in order of server preference.
+    """
+    algorithms = []
+    for name in config["COMPRESSION_ALGORITHMS"]:
+        if name == "br" and brotli is None:
+            continue
+        if name in COMPRESSORS:
+            algorithms.append(name)
+    return algorithms
+
+
+def negotiate_encoding(accept_encodings, algorithms):
+    """
+    Pick the content coding to use for a response.
+
+    Parameters:
+        accept_encodings (Accept): The parsed Accept-Encoding header of the request.
+        algorithms (List[str]): The content codings supported by the server, in order of preference.
+
+    Returns:
+        str: The content coding to use, or None to send the response uncompressed.
+    """
+    best, best_quality = None, 0
+    for name in algorithms:
+        quality = accept_encodings[name]
+        # Ties keep the server preference order
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compress_response(response):
+    config = current_app.config
+
+    if (
+        response.direct_passthrough
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in config["COMPRESSION_MIMETYPES"]
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    data = response.get_data()
+    if len(data) < config["COMPRESSION_MIN_SIZE"]:
+        return response
+
+    encoding = negotiate_encoding(request.accept_encodings, available_algorithms(config))
+    if encoding is None:
+        return response
+
+    response.set_data(COMPRESSORS[encoding](data, config))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    app.config.setdefault("COMPRESSION_ALGORITHMS", ["br", "gzip"])
+    app.config.setdefault("COMPRESSION_MIN_SIZE", 1024)
+    app.config.setdefault("COMPRESSION_GZIP_LEVEL", 6)
+    app.config.setdefault("COMPRESSION_BROTLI_QUALITY", 4)
+    app.config.setdefault("COMPRESSION_MIMETYPES", ["application/json"])
+    app.after_request(compress_response)
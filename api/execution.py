@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from flask import copy_current_request_context
+from graphql import parse, get_operation_ast, GraphQLError
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(max_workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="graphql-batch")
+    return _executor
+
+
+def operation_type(query, operation_name=None):
+    """
+    Get the type of the operation a GraphQL document will execute.
+
+    Parameters:
+        query (str): The GraphQL document.
+        operation_name (str, optional): The name of the operation to execute. Defaults to None.
+
+    Returns:
+        str: "query", "mutation" or "subscription", or None if the document is invalid.
+    """
+    try:
+        operation = get_operation_ast(parse(query), operation_name)
+    except GraphQLError:
+        return None
+    if operation is None:
+        return None
+    return operation.operation.value
+
+
+def format_result(result):
+    if result.errors:
+        return {"errors": [str(error) for error in result.errors]}
+    return {"data": result.data}
+
+
+def validate_operation(operation):
+    """
+    Check the shape of an operation before executing it.
+
+    Returns:
+        str: The error of the operation, or None if it can be executed.
+    """
+    if not isinstance(operation, dict) or not operation.get("query") or not isinstance(operation["query"], str):
+        return "Must provide a query string"
+    if not isinstance(operation.get("variables") or {}, dict):
+        return "Variables must be a JSON object"
+    if not isinstance(operation.get("operationName") or "", str):
+        return "Operation name must be a string"
+    return None
+
+
+def execute_operation(schema, operation, context):
+    """
+    Execute a single GraphQL operation.
+
+    Parameters:
+        schema (Schema): The GraphQL schema.
+        operation (dict): The operation, with a "query" and optional "variables" and "operationName".
+        context (dict): The context shared by every operation of the request.
+
+    Returns:
+        dict: The response for the operation.
+    """
+    # Only this operation fails, the others of its batch still execute
+    error = validate_operation(operation)
+    if error:
+        return {"errors": [error]}
+
+    result = schema.execute(
+        operation["query"],
+        variable_values=operation.get("variables") or {},
+        operation_name=operation.get("operationName"),
+        context_value=context
+    )
+    return format_result(result)
+
+
+def execute_batch(schema, operations, context, max_workers=4):
+    """
+    Execute a batch of GraphQL operations received in a single HTTP request.
+
+    Queries run concurrently on a shared thread pool. Batches containing a mutation run
+    sequentially, in order, so that later operations see the writes of earlier ones.
+
+    Parameters:
+        schema (Schema): The GraphQL schema.
+        operations (list): The operations to execute.
+        context (dict): The context shared by every operation of the request.
+        max_workers (int, optional): The size of the thread pool. 0 disables concurrency. Defaults to 4.
+
+    Returns:
+        list: The responses, in the order of the operations.
+    """
+    has_mutation = any(
+        validate_operation(operation) is None
+        and operation_type(operation.get("query") or "", operation.get("operationName")) == "mutation"
+        for operation in operations
+    )
+
+    if has_mutation or max_workers <= 0 or len(operations) == 1:
+        return [execute_operation(schema, operation, context) for operation in operations]
+
+    executor = _get_executor(max_workers)
+    futures = []
+    for operation in operations:
+        # Each worker thread needs its own copy of the request context
+        run = copy_current_request_context(lambda operation=operation: execute_operation(schema, operation, context))
+        futures.append(executor.submit(run))
+    return [future.result() for future in futures]
@@ -0,0 +1,27 @@
+import json
+
+from flask import current_app
+
+
+def load_persisted_queries(path):
+    """
+    Load the persisted queries clients can execute by ID.
+
+    Parameters:
+        path (str): The path of a JSON file mapping query IDs to GraphQL documents, or None.
+
+    Returns:
+        dict: The persisted queries by ID.
+    """
+    if not path:
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def get_persisted_query(query_id):
+    return current_app.extensions["persisted_queries"].get(query_id)
+
+
+def init_app(app):
+    app.extensions["persisted_queries"] = load_persisted_queries(app.config.get("PERSISTED_QUERIES_PATH"))
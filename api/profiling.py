@@ -0,0 +1,165 @@
+from collections import deque
+import cProfile
+import hmac
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import request, g, current_app
+
+UNSAFE_FILENAME_CHARACTERS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def operation_label():
+    """Get the operation name of the current GraphQL request, for naming its profile."""
+    if request.method == "GET":
+        name = request.args.get("operationName") or request.args.get("id")
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, list):
+            name = "batch"
+        else:
+            name = data.get("operationName") if isinstance(data, dict) else None
+    return UNSAFE_FILENAME_CHARACTERS.sub("_", name or "anonymous")[:64]
+
+
+class ProfileStore:
+    def __init__(self, directory, max_files=100, max_bytes=50 * 1024 * 1024):
+        """
+        A directory of saved profiles, pruned to stay within a number of files and a size.
+
+        Parameters:
+            directory (str): Where the profiles are saved.
+            max_files (int, optional): The number of profiles kept. Defaults to 100.
+            max_bytes (int, optional): The total size of the profiles kept. Defaults to 50 MB.
+        """
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def save(self, profiler, request_id, operation):
+        """
+        Save a profile in pstats format, e.g. for `python -m pstats` or snakeviz.
+
+        Returns:
+            str: The file name of the profile.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{request_id}-{operation}.pstats"
+        profiler.dump_stats(os.path.join(self.directory, filename))
+        self.prune()
+        return filename
+
+    def prune(self):
+        # Remove the oldest profiles first
+        with self._lock:
+            paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".pstats")]
+            files = []
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            files.sort(reverse=True)
+
+            kept_bytes = 0
+            for position, (mtime, size, path) in enumerate(files):
+                kept_bytes += size
+                if position >= self.max_files or kept_bytes > self.max_bytes:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+
+class Profiler:
+    def __init__(self, store, token=None, sample_rate=0.0, max_per_minute=6):
+        """
+        Runs selected GraphQL requests under cProfile.
+
+        Parameters:
+            store (ProfileStore): Where the profiles are saved.
+            token (str, optional): The X-Profile header value that requests a profile. Defaults to None.
+            sample_rate (float, optional): The fraction of requests profiled at random. Defaults to 0.
+            max_per_minute (int, optional): The number of profiles taken per minute, whatever triggered them. Defaults to 6.
+        """
+        self.store = store
+        self.token = token
+        self.sample_rate = sample_rate
+        self.max_per_minute = max_per_minute
+        self._started = deque()
+        self._lock = threading.Lock()
+        # A single profile at a time per process bounds the overhead
+        self._active = threading.Lock()
+
+    def requested(self):
+        header = request.headers.get("X-Profile")
+        if header and self.token and hmac.compare_digest(header.encode(), self.token.encode()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def acquire(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._started and now - self._started[0] >= 60:
+                self._started.popleft()
+            if len(self._started) >= self.max_per_minute:
+                return False
+            if not self._active.acquire(blocking=False):
+                return False
+            self._started.append(now)
+            return True
+
+    def start(self):
+        if request.endpoint != "api.graphql" or not self.requested() or not self.acquire():
+            return
+        g.profile = (cProfile.Profile(), request.headers.get("X-Request-ID") or uuid.uuid4().hex, operation_label())
+        g.profile[0].enable()
+
+    def stop(self, response):
+        profile = g.pop("profile", None)
+        if profile is None:
+            return response
+
+        profiler, request_id, operation = profile
+        profiler.disable()
+        try:
+            filename = self.store.save(profiler, UNSAFE_FILENAME_CHARACTERS.sub("_", request_id)[:64], operation)
+            response.headers["X-Profile-Id"] = filename
+        except OSError:
+            current_app.logger.exception("Could not save profile")
+        finally:
+            self._active.release()
+        return response
+
+    def discard(self, exception=None):
+        # The request failed before after_request ran
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profile[0].disable()
+            self._active.release()
+
+
+def init_app(app):
+    app.config.setdefault("PROFILING_TOKEN", None)
+    app.config.setdefault("PROFILING_SAMPLE_RATE", 0.0)
+    app.config.setdefault("PROFILING_DIR", "profiles")
+    app.config.setdefault("PROFILING_MAX_PER_MINUTE", 6)
+    app.config.setdefault("PROFILING_MAX_FILES", 100)
+    app.config.setdefault("PROFILING_MAX_BYTES", 50 * 1024 * 1024)
+
+    # Without a token or a sample rate no hook is registered, so requests pay nothing
+    if not app.config["PROFILING_TOKEN"] and not app.config["PROFILING_SAMPLE_RATE"]:
+        return
+
+    store = ProfileStore(app.config["PROFILING_DIR"], app.config["PROFILING_MAX_FILES"], app.config["PROFILING_MAX_BYTES"])
+    profiler = Profiler(store, app.config["PROFILING_TOKEN"], app.config["PROFILING_SAMPLE_RATE"], app.config["PROFILING_MAX_PER_MINUTE"])
+    app.extensions["profiler"] = profiler
+    app.before_request(profiler.start)
+    app.after_request(profiler.stop)
+    app.teardown_request(profiler.discard)
@@ -0,0 +1,262 @@
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta, timezone
+import math
+import threading
+import time
+
+from flask import request, g, jsonify, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from .execution import operation_type
+
+Rate = namedtuple("Rate", ["capacity", "period"])
+
+
+def parse_rate(value):
+    """
+    Parse a rate limit.
+
+    Parameters:
+        value (str): The burst size and the period in seconds it refills over, e.g. "10/60".
+
+    Returns:
+        Rate: The rate.
+    """
+    capacity, period = value.split("/")
+    return Rate(int(capacity), float(period))
+
+
+def take_tokens(tokens, updated, now, rate, cost):
+    """
+    Refill a token bucket and take tokens from it.
+
+    Parameters:
+        tokens (float): The tokens left at the last update.
+        updated (float): The time of the last update, in seconds.
+        now (float): The current time, in seconds.
+        rate (Rate): The rate of the bucket.
+        cost (int): The number of tokens to take.
+
+    Returns:
+        tuple: Whether the tokens were taken, the tokens left, and the seconds to wait before retrying.
+    """
+    refill_per_second = rate.capacity / rate.period
+    tokens = min(rate.capacity, tokens + max(now - updated, 0) * refill_per_second)
+    if tokens >= cost:
+        return True, tokens - cost, 0
+    return False, tokens, (cost - tokens) / refill_per_second
+
+
+### Token bucket backends
+class MemoryBackend:
+    """Keeps the buckets in the current process. Each worker enforces its own limits."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (rate.capacity, now))
+            allowed, tokens, retry_after = take_tokens(tokens, updated, now, rate, cost)
+            self._buckets[key] = (tokens, now)
+            # Forget the least recently seen clients, their buckets are full by now
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+class MongoBackend:
+    """
+    Shares the buckets between workers through a MongoDB collection.
+
+    Buckets are updated with compare-and-swap and expire with a TTL index once idle.
+    """
+
+    def __init__(self, collection, max_attempts=5):
+        self.collection = collection
+        self.max_attempts = max_attempts
+        self._indexed = False
+
+    def ensure_indexes(self):
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+        self._indexed = True
+
+    def consume(self, key, rate, cost=1):
+        # Created on first use, so that the app can be created without connecting
+        if not self._indexed:
+            self.ensure_indexes()
+
+        for _ in range(self.max_attempts):
+            now = time.time()
+            bucket = self.collection.find_one({"_id": key})
+            tokens, updated = (bucket["tokens"], bucket["updated"]) if bucket else (rate.capacity, now)
+            allowed, tokens, retry_after = take_tokens(tokens, updated, now, rate, cost)
+
+            fields = {
+                "tokens": tokens,
+                "updated": now,
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=rate.period)
+            }
+            if bucket is None:
+                try:
+                    self.collection.insert_one({"_id": key, **fields})
+                except DuplicateKeyError:
+                    continue
+            else:
+                result = self.collection.update_one(
+                    {"_id": key, "updated": bucket["updated"], "tokens": bucket["tokens"]},
+                    {"$set": fields}
+                )
+                if result.matched_count == 0:
+                    continue
+            return allowed, retry_after
+
+        # Heavy contention on a single key, don't reject on our own account
+        return True, 0
+
+
+class RateLimiter:
+    def __init__(self, backend, rates):
+        """
+        Token bucket rate limits, one budget per kind of request.
+
+        Parameters:
+            backend (MemoryBackend | MongoBackend): Where the buckets are kept.
+            rates (dict): The Rate of each budget, e.g. {"auth": Rate(10, 60)}.
+        """
+        self.backend = backend
+        self.rates = rates
+
+    def consume(self, budget, key, cost=1):
+        """
+        Take tokens from a client's bucket.
+
+        Returns:
+            tuple: Whether the request is allowed, and the seconds to wait before retrying.
+        """
+        return self.backend.consume(f"{budget}:{key}", self.rates[budget], cost)
+
+
+def default_max_concurrency(worker_connections, pool_size, reserved_connections):
+    """
+    Get the number of GraphQL requests executed at once that a worker can sustain.
+
+    The cap must stay below the connections of the worker, since connections beyond them
+    wait in the listen backlog where they are never rejected, and below the MongoDB pool,
+    since executions beyond it wait for a pooled connection. The reserved connections answer
+    the requests over the cap with a 503, and serve the auth routes and background jobs.
+
+    Parameters:
+        worker_connections (int): The connections of the worker, GUNICORN_WORKER_CONNECTIONS.
+        pool_size (int): The MongoDB connections of the worker, MONGO_MAX_POOL_SIZE.
+        reserved_connections (int): The connections kept for everything but executing GraphQL operations.
+
+    Returns:
+        int: The cap, at least 1.
+    """
+    return max(min(worker_connections, pool_size) - reserved_connections, 1)
+
+
+class ConcurrencyLimiter:
+    """Caps the number of requests executed at once, rejecting rather than queueing the excess."""
+
+    def __init__(self, max_concurrent, timeout=0):
+        self.timeout = timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def acquire(self):
+        return self._semaphore.acquire(timeout=self.timeout) if self.timeout > 0 else self._semaphore.acquire(blocking=False)
+
+    def release(self):
+        self._semaphore.release()
+
+
+### Flask integration
+def client_key():
+    # Authenticated clients are limited by identity, others by address
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    if identity is not None:
+        return f"user:{identity}"
+    return f"ip:{request.remote_addr}"
+
+
+def request_budget():
+    """
+    Get the budget and cost of the current request.
+
+    Returns:
+        tuple: The budget name and the number of tokens, or (None, 0) for unlimited requests.
+    """
+    if request.blueprint == "auth":
+        return "auth", 1
+    if request.endpoint != "api.graphql":
+        return None, 0
+    if request.method == "GET":
+        return "read", 1
+
+    data = request.get_json(silent=True)
+    operations = data if isinstance(data, list) else [data]
+    operations = [operation for operation in operations if isinstance(operation, dict)]
+    is_mutation = any(
+        operation_type(operation.get("query") or "", operation.get("operationName")) == "mutation"
+        for operation in operations
+    )
+    # A batch costs one token per operation
+    return ("mutation" if is_mutation else "read"), max(len(operations), 1)
+
+
+def too_many_requests(status, message, retry_after):
+    response = jsonify({"msg": message})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(math.ceil(retry_after), 1))
+    return response
+
+
+def limit_request():
+    # CORS preflight requests are answered without executing anything
+    if request.method == "OPTIONS":
+        return None
+
+    limiter = current_app.extensions["rate_limiter"]
+    budget, cost = request_budget()
+    if budget is not None:
+        try:
+            allowed, retry_after = limiter.consume(budget, client_key(), cost)
+        except PyMongoError:
+            # Fail open when the shared backend is unavailable
+            current_app.logger.exception("Rate limit backend unavailable")
+            allowed, retry_after = True, 0
+        if not allowed:
+            return too_many_requests(429, "Too many requests", retry_after)
+
+    if request.endpoint == "api.graphql":
+        concurrency = current_app.extensions["graphql_concurrency"]
+        if not concurrency.acquire():
+            return too_many_requests(503, "Server is busy", current_app.config["GRAPHQL_RETRY_AFTER"])
+        g.graphql_concurrency_slot = concurrency
+
+
+def release_request(exception=None):
+    concurrency = g.pop("graphql_concurrency_slot", None)
+    if concurrency is not None:
+        concurrency.release()
+
+
+def init_app(app, backend):
+    app.config.setdefault("RATE_LIMITS", {"auth": Rate(10, 60), "read": Rate(120, 60), "mutation": Rate(60, 60)})
+    app.config.setdefault("GRAPHQL_MAX_CONCURRENCY", 32)
+    app.config.setdefault("GRAPHQL_QUEUE_TIMEOUT", 0.05)
+    app.config.setdefault("GRAPHQL_RETRY_AFTER", 1)
+
+    app.extensions["rate_limiter"] = RateLimiter(backend, app.config["RATE_LIMITS"])
+    app.extensions["graphql_concurrency"] = ConcurrencyLimiter(app.config["GRAPHQL_MAX_CONCURRENCY"], app.config["GRAPHQL_QUEUE_TIMEOUT"])
+    app.before_request(limit_request)
+    app.teardown_request(release_request)
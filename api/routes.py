@@ -0,0 +1,88 @@
+from flask import Blueprint, request, jsonify, current_app
+import json
+
+from api.execution import execute_operation, execute_batch, operation_type
+from api.caching import cache_control, make_etag, root_fields
+from api.persisted import get_persisted_query
+from exercise.catalog import catalog_version
+from database.routing import primary_reads
+from schema import schema
+
+api = Blueprint("api", __name__)
+
+def graphql_get():
+    # Read-only operations over GET, so that catalog responses can be cached
+    if "id" in request.args:
+        query = get_persisted_query(request.args["id"])
+        if query is None:
+            return jsonify({"errors": ["PersistedQueryNotFound"]}), 400
+    else:
+        query = request.args.get("query")
+        if not query:
+            return jsonify({"errors": ["Must provide a query string"]}), 400
+    
+    try:
+        variables = json.loads(request.args.get("variables") or "{}")
+    except ValueError:
+        return jsonify({"errors": ["Variables are invalid JSON"]}), 400
+    if not isinstance(variables, dict):
+        return jsonify({"errors": ["Variables must be a JSON object"]}), 400
+    operation_name = request.args.get("operationName")
+    operation = {"query": query, "variables": variables, "operationName": operation_name}
+    
+    if operation_type(query, operation_name) == "mutation":
+        return jsonify({"errors": ["Mutations must be sent with POST"]}), 405, {"Allow": "POST"}
+    
+    cache_control_header = cache_control(root_fields(query, operation_name), current_app.config["GRAPHQL_CACHE_MAX_AGES"])
+    if cache_control_header is None:
+        response = jsonify(execute_operation(schema, operation, {}))
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    
+    # Catalog responses only change with the catalog version
+    etag = make_etag(catalog_version(), query, variables, operation_name)
+    response_cache = current_app.extensions["response_cache"]
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        body = response_cache.get(etag)
+        if body is None:
+            # Cached until the next version bump, so it must not come from a lagging secondary
+            with primary_reads():
+                result = execute_operation(schema, operation, {})
+            body = current_app.json.dumps(result)
+            if "errors" in result:
+                # A transient failure must not be cached by clients or proxies
+                response = current_app.response_class(body, mimetype="application/json")
+                response.headers["Cache-Control"] = "private, no-cache"
+                return response
+            response_cache.set(etag, body)
+        response = current_app.response_class(body, mimetype="application/json")
+    
+    # Weak, since the identity, gzip and br encodings of the body share it
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = cache_control_header
+    return response
+
+@api.route("/graphql", methods=["GET", "POST"])
+# @jwt_required()
+def graphql():
+    if request.method == "GET":
+        return graphql_get()
+    
+    data = request.get_json()
+    
+    # current_app.logger.debug("Received query: %s", data)
+    
+    # State shared by every operation of the request, such as the loaded exercises
+    context = {}
+    
+    # A JSON array runs several operations in a single request
+    if isinstance(data, list):
+        if not data:
+            return jsonify({"errors": ["Must provide at least one operation"]}), 400
+        if len(data) > current_app.config["GRAPHQL_MAX_BATCH_SIZE"]:
+            return jsonify({"errors": [f"Batch size exceeds the maximum of {current_app.config['GRAPHQL_MAX_BATCH_SIZE']} operations"]}), 400
+        return jsonify(execute_batch(schema, data, context, max_workers=current_app.config["GRAPHQL_BATCH_WORKERS"]))
+    
+    return jsonify(execute_operation(schema, data, context))
@@ -0,0 +1,89 @@
+from datetime import date, datetime
+
+from bson import ObjectId
+from flask.json.provider import JSONProvider, DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def default(obj):
+    """
+    Serialize the values the JSON encoders do not handle on their own.
+
+    Parameters:
+        obj (Any): The value that could not be serialized.
+
+    Returns:
+        str: The string representation of the value.
+    """
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+### Standard library provider
+class StdlibJSONProvider(DefaultJSONProvider):
+    # Sorting keys is pure overhead for API responses
+    sort_keys = False
+
+    @staticmethod
+    def default(o):
+        try:
+            return default(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
+
+
+### orjson provider
+class OrjsonJSONProvider(JSONProvider):
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj).decode("utf-8")
+
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Skip the str round trip, orjson already produces utf-8 bytes
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+
+JSON_PROVIDERS = {
+    "stdlib": StdlibJSONProvider,
+    "orjson": OrjsonJSONProvider,
+}
+
+
+def get_json_provider_class(name):
+    """
+    Get the JSON provider class registered under the given name.
+
+    Falls back to the standard library provider when orjson is requested but not installed.
+
+    Parameters:
+        name (str): The name of the provider, "orjson" or "stdlib".
+
+    Returns:
+        type: The JSONProvider subclass to install on the Flask app.
+    """
+    if name not in JSON_PROVIDERS:
+        raise ValueError(f"Unknown JSON serializer '{name}'")
+    if name == "orjson" and orjson is None:
+        return StdlibJSONProvider
+    return JSON_PROVIDERS[name]
+
+
+def init_app(app):
+    provider_class = get_json_provider_class(app.config.get("JSON_SERIALIZER", "orjson"))
+    app.json_provider_class = provider_class
+    app.json = provider_class(app)
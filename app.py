@@ -1,144 +1,113 @@
-from flask import Flask, request, jsonify
-from flask_bcrypt import Bcrypt
-from flask_cors import CORS, cross_origin
-from flask_jwt_extended import JWTManager, jwt_required, create_access_token
-import graphene
-from pymongo import MongoClient
-from graphql import execute
-from decouple import config
+from flask import Flask
+from decouple import config, Csv
 import logging
 from logging.handlers import RotatingFileHandler
-import re
 
-from workout.schema import schema as workout_schema
-from user_auth.schema import schema as user_auth_schema
-from exercise.schema import schema as exercise_schema
-
-# Configure MongoDBClient
-client = MongoClient(config('MONGO_URI'))
-
-db = client["workouttracker"]
-collection = db["users"]
-
-db_user_workouts = client["user_workouts"]
+from extensions import bcrypt, cors, jwt
+from schema import schema
+from api import serialization, compression, persisted, ratelimit, profiling
+from api.caching import ResponseCache, parse_max_ages
+from api.ratelimit import MemoryBackend, MongoBackend, parse_rate, default_max_concurrency
+from database.clients import LazyDatabase
+from database import routing
+from api.routes import api
+from user_auth.routes import auth
+from realtime import sockets
+from stats.runner import start_in_process
+
+
+def create_app():
+    """
+    Create the Flask app.
+
+    Nothing here connects to MongoDB, clients are created on first use in each process,
+    so the app can be created before gunicorn forks its workers.
+
+    Returns:
+        Flask: The app.
+    """
+    app = Flask(__name__)
+    app.debug = config('FLASK_DEBUG', default=False, cast=bool)
+
+    # Configure JWT
+    app.config["JWT_SECRET_KEY"] = config('JWT_SECRET_KEY')
+
+    # Configure batched GraphQL operations
+    app.config["GRAPHQL_MAX_BATCH_SIZE"] = config('GRAPHQL_MAX_BATCH_SIZE', default=10, cast=int)
+    app.config["GRAPHQL_BATCH_WORKERS"] = config('GRAPHQL_BATCH_WORKERS', default=4, cast=int)
+
+    # Configure cacheable GET requests
+    app.config["GRAPHQL_CACHE_MAX_AGES"] = parse_max_ages(config('GRAPHQL_CACHE_MAX_AGES', default='allExercises=3600,allPoses=3600,exerciseSearch=3600'))
+    app.config["PERSISTED_QUERIES_PATH"] = config('PERSISTED_QUERIES_PATH', default=None)
+    app.extensions["response_cache"] = ResponseCache(config('GRAPHQL_RESPONSE_CACHE_SIZE', default=256, cast=int))
+
+    # Configure response serialization and compression
+    app.config["JSON_SERIALIZER"] = config('JSON_SERIALIZER', default='orjson')
+    app.config["COMPRESSION_ALGORITHMS"] = config('COMPRESSION_ALGORITHMS', default='br,gzip', cast=Csv())
+    app.config["COMPRESSION_MIN_SIZE"] = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+    app.config["COMPRESSION_GZIP_LEVEL"] = config('COMPRESSION_GZIP_LEVEL', default=6, cast=int)
+    app.config["COMPRESSION_BROTLI_QUALITY"] = config('COMPRESSION_BROTLI_QUALITY', default=4, cast=int)
+
+    # Configure admission control
+    app.config["RATE_LIMITS"] = {
+        "auth": parse_rate(config('RATE_LIMIT_AUTH', default='10/60')),
+        "read": parse_rate(config('RATE_LIMIT_READ', default='120/60')),
+        "mutation": parse_rate(config('RATE_LIMIT_MUTATION', default='60/60'))
+    }
+    # Derived from the gunicorn connections and the MongoDB pool (same defaults as gunicorn.conf.py and
+    # database/clients.py), so that the cap is reached before requests wait on either
+    max_concurrency = default_max_concurrency(
+        config('GUNICORN_WORKER_CONNECTIONS', default=1000, cast=int),
+        config('MONGO_MAX_POOL_SIZE', default=100, cast=int),
+        config('GRAPHQL_RESERVED_CONNECTIONS', default=4, cast=int)
+    )
+    app.config["GRAPHQL_MAX_CONCURRENCY"] = config('GRAPHQL_MAX_CONCURRENCY', default=max_concurrency, cast=int)
+    app.config["GRAPHQL_QUEUE_TIMEOUT"] = config('GRAPHQL_QUEUE_TIMEOUT', default=0.05, cast=float)
+    if config('RATE_LIMIT_BACKEND', default='memory') == 'mongo':
+        rate_limit_backend = MongoBackend(LazyDatabase("workouttracker")["rate_limits"])
+    else:
+        rate_limit_backend = MemoryBackend()
 
-app = Flask(__name__)
-bcrypt = Bcrypt(app)
+    # Configure on-demand profiling of GraphQL requests
+    app.config["PROFILING_TOKEN"] = config('PROFILING_TOKEN', default=None)
+    app.config["PROFILING_SAMPLE_RATE"] = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+    app.config["PROFILING_DIR"] = config('PROFILING_DIR', default='profiles')
+    app.config["PROFILING_MAX_PER_MINUTE"] = config('PROFILING_MAX_PER_MINUTE', default=6, cast=int)
+    app.config["PROFILING_MAX_FILES"] = config('PROFILING_MAX_FILES', default=100, cast=int)
+    app.config["PROFILING_MAX_BYTES"] = config('PROFILING_MAX_BYTES', default=50 * 1024 * 1024, cast=int)
 
-# Enable CORS
-cors = CORS(app)
+    bcrypt.init_app(app)
+    # Enable CORS
+    cors.init_app(app, expose_headers=[routing.LAST_WRITE_HEADER])
+    jwt.init_app(app)
+    persisted.init_app(app)
+    serialization.init_app(app)
+    compression.init_app(app)
+    ratelimit.init_app(app, rate_limit_backend)
+    # Pin the reads of clients that just wrote to the primary, whichever worker they reach
+    routing.init_app(app)
+    profiling.init_app(app)
 
-class MergedQuery(workout_schema.query, user_auth_schema.query, exercise_schema.query):
-    pass
+    # Push workout changes to subscribed sockets
+    sockets.init_app(app, schema, message_queue=config('SOCKETIO_MESSAGE_QUEUE', default=None), async_mode=config('SOCKETIO_ASYNC_MODE', default=None))
 
-class MergedMutation(workout_schema.mutation):
-    pass
+    app.register_blueprint(auth)
+    app.register_blueprint(api)
 
-schema = graphene.Schema(query=MergedQuery, mutation=MergedMutation)
+    # Configure logging handler
+    handler = RotatingFileHandler('app.log', maxBytes=10000, backupCount=1)
+    handler.setLevel(logging.DEBUG)
+    app.logger.addHandler(handler)
 
-# app.add_url_rule('/graphql', view_func=GraphQLView.as_view('graphql', schema=schema, graphiql=True))
+    # Set logging level for Flask app
+    app.logger.setLevel(logging.DEBUG)
 
-# Configure JWT
-app.config["JWT_SECRET_KEY"] = config('JWT_SECRET_KEY')
-jwt = JWTManager(app)
+    return app
 
-# Configure logging handler
-handler = RotatingFileHandler('app.log', maxBytes=10000, backupCount=1)
-handler.setLevel(logging.DEBUG)
-app.logger.addHandler(handler)
-app.debug = True  # Enable debug mode
 
-# Set logging level for Flask app
-app.logger.setLevel(logging.DEBUG)
+app = create_app()
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
-    
-def validate_email(email):
-    # Email validation regex pattern
-    pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
-    return re.match(pattern, email)
-
-def validate_password(password):
-    # Password validation criteria (at least 8 characters and at least one uppercase letter, one lowercase letter, one digit and a symbol)
-    pattern = r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$'
-    return re.match(pattern, password)
-
-@app.route("/login", methods=["POST"])
-@cross_origin()
-def login():
-    username = request.json.get("username", None)
-    password = request.json.get("password", None)
-    
-    user = collection.find_one({"username": username})
-    
-    if not user:
-        return jsonify({"msg": "User not found"}), 404
-    # bcrypt.check_password_hash returns true if password matches
-    if not bcrypt.check_password_hash(user["password"], password):
-        return jsonify({"msg": "Incorrect password"}), 401
-    access_token = create_access_token(identity=username)
-    return jsonify(access_token=access_token), 200 
-
-@app.route("/signup", methods=["POST"])
-def signup():
-    username = request.json.get("username", None)
-    password = request.json.get("password", None)
-    password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
-    email = request.json.get("email", None)
-    
-    # Validate email
-    if not validate_email(email):
-        return jsonify({"msg": "Invalid email format"}), 400
-
-    # Validate password
-    if not validate_password(password):
-        return jsonify({"msg": "Password must be at least 8 characters long and contain at least one uppercase letter, one lowercase letter, and one digit"}), 400
-
-    user = collection.find_one({"username": username})
-    if user:
-        return jsonify({"msg": "Username already exists"}), 409
-    
-    emailIsTaken = collection.find_one({"email": email})
-    if emailIsTaken:
-        return jsonify({"msg": "Email already exists"}), 409
-    
-    # Create a unique collection for the user based on their ID
-    collection.insert_one({"username": username, "password": password_hash, "email": email})
-    
-    user = collection.find_one({"username": username})
-    user_id = f"user_{user['_id']}"
-    
-    db_user_workouts.create_collection(user_id)
-    
-    return jsonify({"msg": "Account successfully created"}), 200
-
-
-@app.route("/logout", methods=["POST"])
-@jwt_required()
-def logout():
-    # TODO define logout
-    return jsonify({"msg": "Logged out"})
-
-@app.route("/graphql", methods=["POST"])
-# @jwt_required()
-def graphql():
-    data = request.get_json()
-
-    query = data["query"]
-    variables = data.get("variables", {})
-    
-    # app.logger.debug("Received query: %s", query)
-    # app.logger.debug("Received variables: %s", variables)
-    
-    result = schema.execute(
-        query,
-        variable_values = variables
-    )
-    
-    if result.errors:
-        response = {"errors": [str(error) for error in result.errors]}
-    else:
-        response = {"data": result.data}
-    return jsonify(response)
\ No newline at end of file
+    start_in_process()
+    sockets.socketio.run(app, debug=True)
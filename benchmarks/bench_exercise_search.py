@@ -0,0 +1,70 @@
+"""
+Measure the build time and query latency of the exercise search index on a synthetic
+catalog.
+
+Usage:
+    python benchmarks/bench_exercise_search.py [num_exercises]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exercise.search import ExerciseIndex
+
+EQUIPMENT = ["Barbell", "Dumbbell", "Cable", "Kettlebell", "Machine", "Band", "Smith", "Landmine"]
+VARIANTS = ["Incline", "Decline", "Seated", "Standing", "Single Arm", "Close Grip", "Wide Grip", "Pause", "Tempo"]
+MOVEMENTS = ["Bench Press", "Squat", "Deadlift", "Row", "Curl", "Shoulder Press", "Lunge", "Fly", "Pulldown", "Extension", "Raise", "Hip Thrust"]
+MUSCLES = ["Chest", "Back", "Shoulders", "Biceps", "Triceps", "Quadriceps", "Hamstrings", "Glutes", "Calves", "Abs"]
+
+
+def make_exercises(count, rng):
+    exercises = []
+    for i in range(count):
+        name = f"{rng.choice(EQUIPMENT)} {rng.choice(VARIANTS)} {rng.choice(MOVEMENTS)} {i}"
+        exercises.append({
+            "_id": str(i),
+            "name": name,
+            "description": [f"Perform the {name.lower()} with control.", "Keep a neutral spine."],
+            "muscles": rng.sample(MUSCLES, 2),
+        })
+    return exercises
+
+
+def make_queries(exercises, count, rng):
+    queries = []
+    for _ in range(count):
+        words = rng.choice(exercises)["name"].lower().split()
+        query = " ".join(words[:rng.randint(1, 2)])[:rng.randint(2, 12)]
+        # A typo in a third of the queries
+        if len(query) > 4 and rng.random() < 0.33:
+            position = rng.randrange(len(query))
+            query = query[:position] + rng.choice("abcdefghijklmnopqrstuvwxyz") + query[position + 1:]
+        queries.append(query)
+    return queries
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(42)
+    exercises = make_exercises(count, rng)
+
+    start = time.perf_counter()
+    index = ExerciseIndex(exercises, version=1)
+    print(f"Built index of {count} exercises in {(time.perf_counter() - start) * 1e3:.0f} ms")
+
+    timings = []
+    for query in make_queries(exercises, 2000, rng):
+        start = time.perf_counter()
+        index.search(query, limit=10)
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    for label, quantile in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        print(f"{label}: {timings[int(quantile * (len(timings) - 1))] * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compare the cost of encoding a large `workouts` response with each JSON provider,
+and the size and cost of compressing it.
+
+Usage:
+    python benchmarks/bench_serialization.py [num_workouts]
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.serialization import StdlibJSONProvider, OrjsonJSONProvider, orjson
+from api.compression import COMPRESSORS, brotli
+
+
+def make_response_data(num_workouts):
+    exercise = {
+        "_id": str(ObjectId()),
+        "name": "Barbell Bench Press",
+        "description": ["Lie on the bench.", "Lower the bar to the chest.", "Press the bar up."],
+        "muscles": ["Chest", "Triceps", "Shoulders"],
+        "image": "https://example.com/images/bench-press.png",
+    }
+    start = datetime(2023, 1, 1)
+    workouts = [
+        {
+            "_id": str(ObjectId()),
+            "exercise": exercise,
+            "sets": 4,
+            "reps": 10,
+            "weight": 80,
+            "duration": None,
+            "date": (start + timedelta(days=i)).strftime("%Y-%m-%d"),
+            "done": i % 3 != 0,
+            "comment": "Felt strong today",
+            "userId": str(ObjectId()),
+        }
+        for i in range(num_workouts)
+    ]
+    return {"data": {"workouts": {"workouts": workouts, "numPages": 1}}}
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{label:<32} {seconds * 1e3:8.3f} ms")
+
+
+def main():
+    num_workouts = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    data = make_response_data(num_workouts)
+    app = Flask(__name__)
+    number = 20
+
+    print(f"Encoding {num_workouts} workouts")
+    # Flask's default provider is what jsonify used before providers were configurable
+    baseline = DefaultJSONProvider(app)
+    bench("flask default (baseline)", lambda: baseline.dumps(data), number)
+    stdlib = StdlibJSONProvider(app)
+    bench("stdlib, unsorted keys", lambda: stdlib.dumps(data), number)
+    if orjson is not None:
+        fast = OrjsonJSONProvider(app)
+        bench("orjson", lambda: fast.dumps_bytes(data), number)
+    else:
+        print("orjson is not installed, skipping")
+
+    body = baseline.dumps(data).encode("utf-8")
+    config = {"COMPRESSION_GZIP_LEVEL": 6, "COMPRESSION_BROTLI_QUALITY": 4}
+    print(f"\nCompressing {len(body)} bytes")
+    for name, compressor in COMPRESSORS.items():
+        if name == "br" and brotli is None:
+            print("brotli is not installed, skipping")
+            continue
+        size = len(compressor(body, config))
+        bench(f"{name} ({size} bytes)", lambda: compressor(body, config), number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Measure the cost of importing the app, which is what each worker (or the gunicorn
+master with preload_app) pays at startup.
+
+Usage:
+    python benchmarks/bench_startup.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_app(env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app"], cwd=ROOT, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def slowest_imports(env, count=10):
+    # -X importtime reports "self | cumulative | module" on stderr, in microseconds
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), module.rstrip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    env = dict(os.environ)
+    # Importing must not need a reachable database
+    env.setdefault("MONGO_URI", "mongodb://localhost:1")
+    env.setdefault("JWT_SECRET_KEY", "benchmark")
+
+    timings = [import_app(env) for _ in range(runs)]
+    print(f"import app over {runs} runs: median {statistics.median(timings) * 1e3:.1f} ms, min {min(timings) * 1e3:.1f} ms")
+
+    print("\nSlowest imports (cumulative)")
+    for cumulative, module in slowest_imports(env):
+        print(f"{cumulative / 1e3:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
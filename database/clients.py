@@ -0,0 +1,73 @@
+import os
+import threading
+
+from pymongo import MongoClient
+from decouple import config
+
+from .slow_queries import create_listener
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Get the MongoClient of the current process.
+
+    The client is created on first use and again after a fork, since pymongo clients
+    must not be shared between a parent process and its children.
+
+    Returns:
+        MongoClient: The client.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != pid:
+            uri = config('MONGO_URI')
+            # Commands slower than SLOW_QUERY_MS are explained in the background, 0 disables it
+            slow_query_ms = config('SLOW_QUERY_MS', default=100, cast=float)
+            listeners = [create_listener(uri, slow_query_ms)] if slow_query_ms > 0 else []
+            # GRAPHQL_MAX_CONCURRENCY is derived from the pool size, see app.py
+            max_pool_size = config('MONGO_MAX_POOL_SIZE', default=100, cast=int)
+            _client = MongoClient(uri, maxPoolSize=max_pool_size, event_listeners=listeners)
+            _client_pid = pid
+    return _client
+
+
+def reset_client():
+    """Forget the client of the current process, the next use creates a new one."""
+    global _client, _client_pid
+    with _lock:
+        _client, _client_pid = None, None
+
+
+### Lazy handles, safe to create at import time
+class LazyDatabase:
+    def __init__(self, name):
+        self.name = name
+
+    def get(self):
+        return get_client()[self.name]
+
+    def __getitem__(self, collection_name):
+        return LazyCollection(self.name, collection_name)
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+
+class LazyCollection:
+    def __init__(self, database_name, name):
+        self.database_name = database_name
+        self.name = name
+
+    def get(self):
+        return get_client()[self.database_name][self.name]
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
@@ -0,0 +1,162 @@
+"""
+Suggest indexes from the slow queries captured by the slow query listener.
+
+Usage:
+    python -m database.index_advisor [--min-count N] [--ratio R]
+"""
+import argparse
+import json
+
+from decouple import config
+from pymongo import MongoClient
+
+EQUALITY_OPERATORS = {"$eq", "$in"}
+
+
+def filter_fields(filter_shape):
+    """
+    Split the fields of a filter by how an index can serve them.
+
+    Parameters:
+        filter_shape (dict): The shape of a filter.
+
+    Returns:
+        tuple: The fields matched by equality, and the fields matched by range.
+    """
+    equality, ranges = [], []
+    for field, condition in (filter_shape or {}).items():
+        if field == "$and":
+            for clause in condition:
+                clause_equality, clause_ranges = filter_fields(clause)
+                equality += clause_equality
+                ranges += clause_ranges
+        elif field.startswith("$"):
+            # $or and $expr need more than a single compound index
+            continue
+        elif isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+            (equality if set(condition) <= EQUALITY_OPERATORS else ranges).append(field)
+        else:
+            equality.append(field)
+    return equality, ranges
+
+
+def query_parts(command, shape):
+    """
+    Get the filter and the sort an index could serve for a command.
+
+    The filter of a pipeline is made of its leading $match stages, and its sort of the $sort that follows them.
+
+    Returns:
+        tuple: The filter and sort shapes.
+    """
+    if command == "find":
+        return shape.get("filter") or {}, shape.get("sort") or {}
+    if command != "aggregate":
+        return shape.get("query") or {}, {}
+
+    matches, sort = [], {}
+    for stage in shape.get("pipeline") or []:
+        if "$match" in stage:
+            matches.append(stage["$match"])
+            continue
+        if "$sort" in stage:
+            sort = stage["$sort"]
+        break
+    return {"$and": matches}, sort
+
+
+def suggest_index(command, shape):
+    """
+    Suggest the keys of an index for a command, equality fields first, then sort fields, then range fields.
+
+    Parameters:
+        command (str): The name of the command, e.g. "find".
+        shape (dict): The shape of the command.
+
+    Returns:
+        List[tuple]: The index keys as (field, direction) pairs, or None when no field can be indexed.
+    """
+    filter_shape, sort = query_parts(command, shape)
+    equality, ranges = filter_fields(filter_shape)
+
+    keys = [(field, 1) for field in equality]
+    keys += [(field, direction) for field, direction in sort.items() if isinstance(direction, int)]
+    keys += [(field, 1) for field in ranges]
+
+    unique_keys, seen = [], set()
+    for field, direction in keys:
+        if field not in seen:
+            seen.add(field)
+            unique_keys.append((field, direction))
+    return unique_keys or None
+
+
+def needs_index(plan, ratio):
+    # Commands not explained yet are reported, they were slow all the same
+    if not plan:
+        return True
+    return plan["collscan"] or plan["docs_examined"] > ratio * max(plan["returned"], 1)
+
+
+def report(slow_queries, min_count=1, ratio=10):
+    """
+    Aggregate the slow query shapes into suggested indexes.
+
+    Parameters:
+        slow_queries (Collection): The slow queries recorded by the explainer.
+        min_count (int, optional): The number of slow runs a shape needs to be reported. Defaults to 1.
+        ratio (float, optional): The documents examined per document returned above which an index is missing. Defaults to 10.
+
+    Returns:
+        list: The suggestions, with their namespace, keys and slow runs, most time spent first.
+    """
+    suggestions = {}
+    for doc in slow_queries.find({"count": {"$gte": min_count}}):
+        plan = doc.get("plan")
+        if not needs_index(plan, ratio):
+            continue
+        keys = suggest_index(doc["command"], json.loads(doc["shape"]))
+        if keys is None:
+            continue
+
+        suggestion = suggestions.setdefault((doc["namespace"], tuple(keys)), {
+            "namespace": doc["namespace"],
+            "keys": keys,
+            "count": 0,
+            "total_ms": 0,
+            "collscans": 0,
+            "shapes": 0
+        })
+        suggestion["count"] += doc["count"]
+        suggestion["total_ms"] += doc["total_ms"]
+        suggestion["collscans"] += doc["count"] if plan and plan["collscan"] else 0
+        suggestion["shapes"] += 1
+
+    return sorted(suggestions.values(), key=lambda suggestion: -suggestion["total_ms"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suggest indexes from the captured slow queries.")
+    parser.add_argument("--min-count", type=int, default=1, help="slow runs a query shape needs to be reported")
+    parser.add_argument("--ratio", type=float, default=10, help="documents examined per document returned above which an index is missing")
+    args = parser.parse_args()
+
+    # A client without the slow query listener
+    client = MongoClient(config('MONGO_URI'))
+    suggestions = report(client["workouttracker"]["slow_queries"], args.min_count, args.ratio)
+    if not suggestions:
+        print("No index suggestions.")
+        return
+
+    for suggestion in suggestions:
+        database_name, collection_name = suggestion["namespace"].split(".", 1)
+        keys = ", ".join(f'"{field}": {direction}' for field, direction in suggestion["keys"])
+        print(f"use {database_name}; db.getCollection(\"{collection_name}\").createIndex({{{keys}}})")
+        if "*" in collection_name:
+            print("    on each per-user collection matching the pattern")
+        print(f"    {suggestion['count']} slow runs, {suggestion['total_ms']:.0f} ms total, "
+              f"{suggestion['collscans']} collection scans, {suggestion['shapes']} query shapes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+from collections import namedtuple
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+
+from decouple import config
+from flask import g, request, has_request_context
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+
+### Workload classes
+# Reads that must see the latest writes, e.g. the workout log
+TRANSACTIONAL = "transactional"
+# Aggregations over a user's history that tolerate some staleness
+ANALYTICS = "analytics"
+# Exercises and poses, which rarely change
+CATALOG = "catalog"
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+Workload = namedtuple("Workload", ["read_preference", "max_time_ms"])
+
+
+def make_read_preference(mode, max_staleness=-1):
+    """
+    Build a pymongo read preference.
+
+    Parameters:
+        mode (str): The read preference mode, e.g. "secondaryPreferred".
+        max_staleness (int, optional): The maximum replication lag in seconds, -1 for no limit. Ignored for "primary". Defaults to -1.
+
+    Returns:
+        _ServerMode: The read preference.
+    """
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown read preference '{mode}'")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCES[mode](max_staleness=max_staleness)
+
+
+def load_workload(name, mode, max_staleness, max_time_ms):
+    prefix = name.upper()
+    return Workload(
+        read_preference=make_read_preference(
+            config(f'READ_PREFERENCE_{prefix}', default=mode),
+            config(f'MAX_STALENESS_{prefix}', default=max_staleness, cast=int)
+        ),
+        max_time_ms=config(f'MAX_TIME_MS_{prefix}', default=max_time_ms, cast=int)
+    )
+
+
+WORKLOADS = {
+    TRANSACTIONAL: load_workload(TRANSACTIONAL, "primary", -1, 5000),
+    ANALYTICS: load_workload(ANALYTICS, "secondaryPreferred", 90, 10000),
+    CATALOG: load_workload(CATALOG, "nearest", 90, 2000),
+}
+
+_current_workload = contextvars.ContextVar("workload", default=TRANSACTIONAL)
+_primary_reads = contextvars.ContextVar("primary_reads", default=False)
+
+
+### Read-your-writes
+# Carries the last write of a client to the other workers, as "<user ID>:<timestamp>"
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+class RecentWrites:
+    """
+    Remembers which users wrote recently, so that their reads are not routed to a
+    secondary that may not have replicated those writes yet.
+
+    Only the writes handled by the current process are remembered. Writes handled by
+    other workers are known from the marker the client sends back, see wrote_recently.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._writes = {}
+        self._lock = threading.Lock()
+
+    def record(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            self._writes[str(user_id)] = now
+            # Forget users whose window expired once in a while
+            if len(self._writes) > 10000:
+                self._writes = {user: at for user, at in self._writes.items() if now - at < self.window}
+
+    def wrote_recently(self, user_id):
+        with self._lock:
+            at = self._writes.get(str(user_id))
+        return at is not None and time.monotonic() - at < self.window
+
+
+recent_writes = RecentWrites(config('READ_YOUR_WRITES_WINDOW', default=120, cast=float))
+
+
+def record_write(user_id):
+    recent_writes.record(user_id)
+    # Sent back to the client, whose next requests may land on another worker
+    if has_request_context():
+        g.last_write = f"{user_id}:{time.time():.3f}"
+
+
+def parse_last_write(marker):
+    """
+    Parse a last write marker.
+
+    Returns:
+        tuple: The user ID and the time of the write, or None if the marker is invalid.
+    """
+    user_id, _, at = (marker or "").rpartition(":")
+    try:
+        return user_id, float(at)
+    except ValueError:
+        return None
+
+
+def wrote_recently(user_id):
+    """Tell whether a user wrote within READ_YOUR_WRITES_WINDOW seconds, in this session or this process."""
+    if recent_writes.wrote_recently(user_id):
+        return True
+    if not has_request_context():
+        return False
+    last_write = parse_last_write(request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE))
+    return last_write is not None and last_write[0] == str(user_id) and time.time() - last_write[1] < recent_writes.window
+
+
+def send_last_write(response):
+    last_write = g.pop("last_write", None)
+    if last_write is not None:
+        response.set_cookie(LAST_WRITE_COOKIE, last_write, max_age=int(recent_writes.window), httponly=True, samesite="Lax")
+        response.headers[LAST_WRITE_HEADER] = last_write
+    return response
+
+
+def init_app(app):
+    app.after_request(send_last_write)
+
+
+def workload(name):
+    """
+    Declare the workload class of a resolver.
+
+    Parameters:
+        name (str): TRANSACTIONAL, ANALYTICS or CATALOG.
+
+    Returns:
+        callable: The decorator.
+    """
+    if name not in WORKLOADS:
+        raise ValueError(f"Unknown workload '{name}'")
+
+    def decorator(resolver):
+        @functools.wraps(resolver)
+        def wrapper(*args, **kwargs):
+            token = _current_workload.set(name)
+            try:
+                return resolver(*args, **kwargs)
+            finally:
+                _current_workload.reset(token)
+
+        wrapper.workload = name
+        return wrapper
+
+    return decorator
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """
+    Read from the primary whatever the workload, e.g. to fill a cache keyed by the catalog
+    version, which a lagging secondary may not have caught up with.
+    """
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+def current_workload():
+    return WORKLOADS[_current_workload.get()]
+
+
+def routed(collection, user_id=None):
+    """
+    Apply the read preference of the current workload to a collection.
+
+    Parameters:
+        collection (Collection): The collection to read from.
+        user_id (str, optional): The user the data belongs to. Users who wrote within
+            READ_YOUR_WRITES_WINDOW seconds, according to this process or to the marker
+            their client sends back, read from the primary. Defaults to None.
+
+    Returns:
+        Collection: The collection configured for the current workload.
+    """
+    if _primary_reads.get():
+        return collection.with_options(read_preference=Primary())
+    read_preference = current_workload().read_preference
+    if user_id is not None and not isinstance(read_preference, Primary) and wrote_recently(user_id):
+        read_preference = Primary()
+    return collection.with_options(read_preference=read_preference)
+
+
+def max_time_ms():
+    """Get the server-side time budget of the current workload, in milliseconds."""
+    return current_workload().max_time_ms
@@ -0,0 +1,275 @@
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+import queue
+import re
+import threading
+import time
+
+from pymongo import MongoClient, monitoring
+
+logger = logging.getLogger(__name__)
+
+# Read commands whose plans can be explained
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct"}
+# Fields of a command that make up its shape
+SHAPE_FIELDS = {
+    "find": ("filter", "sort", "projection"),
+    "aggregate": ("pipeline",),
+    "count": ("query",),
+    "distinct": ("key", "query"),
+}
+# Keys whose values are part of the shape, e.g. sort directions
+STRUCTURAL_KEYS = {"sort", "$sort", "projection", "$project", "hint"}
+# Per-user collections such as user_<ObjectId> share a shape
+COLLECTION_ID_PATTERN = re.compile(r"[0-9a-f]{24}")
+
+
+def strip_literals(value, key=None):
+    """
+    Replace the literal values of a query by "?", keeping its structure.
+
+    Parameters:
+        value: A filter, sort or pipeline.
+        key (str, optional): The key the value is found under. Defaults to None.
+
+    Returns:
+        The shape of the value.
+    """
+    if key in STRUCTURAL_KEYS:
+        return value
+    if isinstance(value, dict):
+        return {field: strip_literals(field_value, field) for field, field_value in value.items()}
+    if isinstance(value, list):
+        shapes = [strip_literals(item, key) for item in value]
+        # $in: [1, 2, 3] has the shape of $in: [1]
+        if shapes and all(shape == "?" for shape in shapes):
+            return ["?"]
+        return shapes
+    if isinstance(value, str) and value.startswith("$"):
+        # Field paths such as "$exercise" are not literals
+        return value
+    return "?"
+
+
+def normalize_collection(name):
+    return COLLECTION_ID_PATTERN.sub("*", name)
+
+
+def command_shape(command_name, command):
+    """
+    Get the shape of a read command, without literals.
+
+    Returns:
+        dict: The shape fields of the command.
+    """
+    shape = {
+        field: strip_literals(command[field], field)
+        for field in SHAPE_FIELDS[command_name] if field in command
+    }
+    # The field a distinct reads is not a literal
+    if "key" in shape:
+        shape["key"] = command["key"]
+    return shape
+
+
+def shape_id(namespace, command_name, shape):
+    text = json.dumps([namespace, command_name, shape], default=str)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def find_key(document, key):
+    """Find the first value of a key in nested explain output, depth first."""
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        values = document.values()
+    elif isinstance(document, list):
+        values = document
+    else:
+        return None
+    for value in values:
+        found = find_key(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+def plan_stages(plan):
+    stages = []
+    while isinstance(plan, dict):
+        stages.append((plan.get("stage"), plan.get("indexName")))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return stages
+
+
+def summarize_plan(explain):
+    """
+    Summarize the explain output of a command.
+
+    Parameters:
+        explain (dict): The result of the explain command, with executionStats verbosity.
+
+    Returns:
+        dict: Whether the collection was scanned, the indexes used, and the keys and documents examined.
+    """
+    query_planner = find_key(explain, "queryPlanner") or {}
+    winning_plan = query_planner.get("winningPlan") or {}
+    # Slot-based execution nests the classic plan under queryPlan
+    stages = plan_stages(winning_plan.get("queryPlan", winning_plan))
+    execution_stats = find_key(explain, "executionStats") or {}
+    return {
+        "collscan": any(stage == "COLLSCAN" for stage, index in stages),
+        "indexes": sorted({index for stage, index in stages if index}),
+        "stages": [stage for stage, index in stages if stage],
+        "keys_examined": execution_stats.get("totalKeysExamined", 0),
+        "docs_examined": execution_stats.get("totalDocsExamined", 0),
+        "returned": execution_stats.get("nReturned", 0),
+    }
+
+
+def explain_command(command_name, command):
+    # The explained command must not carry session or cluster fields
+    return {
+        key: value for key, value in command.items()
+        if not key.startswith("$") and key not in ("lsid", "txnNumber", "readConcern", "cursor", "maxTimeMS")
+    } | ({"cursor": {}} if command_name == "aggregate" else {})
+
+
+class Explainer:
+    def __init__(self, client_factory, database="workouttracker", collection="slow_queries", interval=300, queue_size=100):
+        """
+        Explains slow commands in a background thread and records their plans.
+
+        Parameters:
+            client_factory (callable): Creates the MongoClient used to explain and record. It must
+                not have the slow query listener, so that explains are not captured in turn.
+            database (str, optional): The database of the slow query collection. Defaults to "workouttracker".
+            collection (str, optional): The slow query collection. Defaults to "slow_queries".
+            interval (float, optional): The seconds before a shape is explained again. Defaults to 300.
+            queue_size (int, optional): The number of slow commands waiting to be explained. Defaults to 100.
+        """
+        self.client_factory = client_factory
+        self.database = database
+        self.collection = collection
+        self.interval = interval
+        self._queue = queue.Queue(queue_size)
+        self._explained = {}
+        self._client = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, capture):
+        """Queue a slow command, dropping it when the explainer falls behind."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slow-query-explainer", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(capture)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        while True:
+            capture = self._queue.get()
+            try:
+                self.process(capture)
+            except Exception:
+                logger.exception("Could not record slow query on %s", capture["namespace"])
+
+    def process(self, capture):
+        """
+        Record a slow command, explaining its shape unless it was explained within the interval.
+
+        Parameters:
+            capture (dict): The slow command, as captured by SlowQueryListener.
+        """
+        if self._client is None:
+            self._client = self.client_factory()
+
+        update = {
+            "$setOnInsert": {
+                "namespace": capture["namespace"],
+                "command": capture["command_name"],
+                "shape": json.dumps(capture["shape"], default=str),
+                "first_seen": capture["at"]
+            },
+            "$set": {"last_seen": capture["at"]},
+            "$inc": {"count": 1, "total_ms": capture["duration_ms"]},
+            "$max": {"max_ms": capture["duration_ms"]}
+        }
+
+        now = time.monotonic()
+        explained_at = self._explained.get(capture["shape_id"])
+        if explained_at is None or now - explained_at >= self.interval:
+            self._explained[capture["shape_id"]] = now
+            explain = self._client[capture["database"]].command({
+                "explain": explain_command(capture["command_name"], capture["command"]),
+                "verbosity": "executionStats"
+            })
+            update["$set"]["plan"] = summarize_plan(explain)
+
+        self._client[self.database][self.collection].update_one({"_id": capture["shape_id"]}, update, upsert=True)
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    def __init__(self, threshold_ms, explainer):
+        """
+        Captures the read commands slower than a threshold.
+
+        Parameters:
+            threshold_ms (float): The duration above which a command is slow.
+            explainer (Explainer): Explains and records the slow commands.
+        """
+        self.threshold_ms = threshold_ms
+        self.explainer = explainer
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE_COMMANDS:
+            with self._lock:
+                self._started[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event):
+        if event.command_name not in EXPLAINABLE_COMMANDS:
+            return
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        duration_ms = event.duration_micros / 1000
+        if started is None or duration_ms < self.threshold_ms:
+            return
+
+        database_name, command = started
+        namespace = f"{database_name}.{normalize_collection(str(command[event.command_name]))}"
+        shape = command_shape(event.command_name, command)
+        self.explainer.submit({
+            "shape_id": shape_id(namespace, event.command_name, shape),
+            "namespace": namespace,
+            "database": database_name,
+            "command_name": event.command_name,
+            "command": command,
+            "shape": shape,
+            "duration_ms": duration_ms,
+            "at": datetime.now(timezone.utc)
+        })
+
+    def failed(self, event):
+        with self._lock:
+            self._started.pop((event.connection_id, event.request_id), None)
+
+
+def create_listener(uri, threshold_ms):
+    """
+    Create the slow query listener of a MongoClient.
+
+    Parameters:
+        uri (str): The MongoDB URI, used by a separate client for the explains.
+        threshold_ms (float): The duration above which a command is slow.
+
+    Returns:
+        SlowQueryListener: The listener.
+    """
+    return SlowQueryListener(threshold_ms, Explainer(lambda: MongoClient(uri)))
@@ -0,0 +1,86 @@
+"""
+The version of the exercises and poses catalog, part of the ETag of cached catalog responses.
+
+The catalog is edited outside the app, bump its version after every edit so that clients
+and caches drop the responses they hold:
+
+Usage:
+    python -m exercise.catalog bump
+    python -m exercise.catalog show
+"""
+import argparse
+import threading
+import time
+
+from pymongo import ReturnDocument
+from decouple import config
+
+from database.clients import LazyDatabase
+
+# MongoDB handles, connected on first use in each worker process
+db = LazyDatabase("workouttracker")
+meta_collection = db["meta"]
+
+CATALOG_VERSION_TTL = config('CATALOG_VERSION_TTL', default=30, cast=float)
+
+_cached_version = None
+_cached_at = 0
+_lock = threading.Lock()
+
+
+def catalog_version():
+    """
+    Get the version of the exercises and poses catalog.
+
+    The version is read from the "catalog" document of the meta collection and kept in
+    memory for CATALOG_VERSION_TTL seconds, so most calls do not touch the database.
+
+    Returns:
+        int: The catalog version, 0 if the catalog was never bumped.
+    """
+    global _cached_version, _cached_at
+    now = time.monotonic()
+    with _lock:
+        if _cached_version is not None and now - _cached_at < CATALOG_VERSION_TTL:
+            return _cached_version
+
+    meta = meta_collection.find_one({"_id": "catalog"})
+    version = meta["version"] if meta else 0
+
+    with _lock:
+        _cached_version, _cached_at = version, now
+    return version
+
+
+def bump_catalog_version():
+    """
+    Mark the catalog as changed. Must be called after editing the exercises or poses collections.
+
+    Returns:
+        int: The new catalog version.
+    """
+    global _cached_version, _cached_at
+    meta = meta_collection.find_one_and_update(
+        {"_id": "catalog"},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    with _lock:
+        _cached_version, _cached_at = meta["version"], time.monotonic()
+    return meta["version"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read or bump the version of the exercises and poses catalog.")
+    parser.add_argument("command", choices=["bump", "show"], help="bump the version after editing the catalog, or show it")
+    args = parser.parse_args()
+
+    if args.command == "bump":
+        print(bump_catalog_version())
+    else:
+        print(catalog_version())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+from bson import ObjectId
+
+
+def request_cache(info, name):
+    """
+    Get a cache shared by every operation executed for the same HTTP request.
+
+    Parameters:
+        info (Info): The GraphQL information object. May be None when resolvers are called directly.
+        name (str): The name of the cache.
+
+    Returns:
+        dict: The cache, or None when the operation was executed without a context.
+    """
+    context = getattr(info, "context", None)
+    if not isinstance(context, dict):
+        return None
+    return context.setdefault(name, {})
+
+
+def load_exercise(info, collection, exercise_id):
+    """
+    Load an exercise by ID, reusing the exercises already loaded for the current request.
+
+    Parameters:
+        info (Info): The GraphQL information object.
+        collection (Collection): The exercises collection.
+        exercise_id (str): The ID of the exercise.
+
+    Returns:
+        dict: The exercise document, or None if it does not exist.
+    """
+    cache = request_cache(info, "exercises")
+    if cache is not None and exercise_id in cache:
+        return cache[exercise_id]
+
+    exercise = collection.find_one({"_id": ObjectId(exercise_id)})
+    if cache is not None:
+        cache[exercise_id] = exercise
+    return exercise
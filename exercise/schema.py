@@ -1,23 +1,26 @@
-from pymongo import MongoClient
-from decouple import config
 from bson import ObjectId
-from graphene import ObjectType, List, String, Schema
+from graphene import ObjectType, List, String, Int
 
 from .models import Exercise, Poses
+from .loaders import request_cache
+from .catalog import catalog_version
+from .search import get_index
+from database.clients import LazyDatabase
+from database.routing import workload, routed, primary_reads, max_time_ms, ANALYTICS, CATALOG
 
-# Configure MongoDBClient
-client = MongoClient(config('MONGO_URI'))
-
-db = client["workouttracker"]
+# MongoDB handles, connected on first use in each worker process
+db = LazyDatabase("workouttracker")
 exercises_collection = db["exercises"]
 poses_collection = db["poses"]
-db_user_workouts = client["user_workouts"]
+db_user_workouts = LazyDatabase("user_workouts")
 
 class Query(ObjectType):
     all_exercises = List(Exercise, muscles=List(String))
     all_poses = List(Poses)
     user_exercises = List(Exercise, user_id=String(required=True), muscles=List(String))
+    exercise_search = List(Exercise, prefix=String(required=True), muscles=List(String), limit=Int(default_value=10))
 
+    @workload(CATALOG)
     def resolve_all_exercises(self, info, muscles=List(String)):
         pipeline = []
 
@@ -30,33 +33,57 @@ class Query(ObjectType):
         pipeline.append({"$sort": {"name": 1}})
 
         # Execute the aggregation pipeline
-        exercises = list(exercises_collection.aggregate(pipeline))
+        exercises = list(routed(exercises_collection).aggregate(pipeline, maxTimeMS=max_time_ms()))
+
+        # Let later operations of the same request reuse the loaded exercises
+        cache = request_cache(info, "exercises")
+        if cache is not None:
+            cache.update((str(exercise["_id"]), exercise) for exercise in exercises)
 
         exercise_objects = [Exercise(**exercise) for exercise in exercises]
 
         return exercise_objects
     
+    @workload(CATALOG)
     def resolve_all_poses(self, info):
         poses = []
         
-        for pose in poses_collection.find():
+        for pose in routed(poses_collection).find(max_time_ms=max_time_ms()):
             poses.append(Poses(**pose))
         return poses
     
+    @workload(ANALYTICS)
     def resolve_user_exercises(self, info, user_id, muscles=List(String)):
         query = {}
         
-        user_collection = db_user_workouts[f"user_{user_id}"]
+        user_collection = routed(db_user_workouts[f"user_{user_id}"], user_id)
 
         if muscles:
             query = {"exercise.muscles": {"$in": muscles}}
             
-        exercises_cursor = user_collection.find(query).distinct("exercise")
+        exercises_cursor = user_collection.find(query, max_time_ms=max_time_ms()).distinct("exercise")
 
         exercises = [Exercise(**exercise) for exercise in exercises_cursor]
 
         return exercises
 
-        
-### Main entry point for the API
-schema = Schema(query=Query)
\ No newline at end of file
+    @workload(CATALOG)
+    def resolve_exercise_search(self, info, prefix, muscles=None, limit=10):
+        """
+        Search the exercises by name, muscles or description as the user types.
+
+        Parameters:
+            info (Info): The GraphQL information object.
+            prefix (str): The text typed by the user.
+            muscles (List[str], optional): Muscles the exercises must all work. Defaults to None.
+            limit (int, optional): The maximum number of results, at most 50. Defaults to 10.
+
+        Returns:
+            List[Exercise]: The matching exercises, best match first.
+        """
+        # The in-memory index is kept until the catalog version changes, so it is built
+        # from the primary rather than from a secondary that may lag behind the bump
+        with primary_reads():
+            index = get_index(routed(exercises_collection), catalog_version())
+        exercises = index.search(prefix, muscles, min(max(limit, 0), 50))
+        return [Exercise(**exercise) for exercise in exercises]
@@ -0,0 +1,175 @@
+from bisect import bisect_left
+import heapq
+import re
+import threading
+
+# Weight of a match in each field of the exercise
+FIELD_WEIGHTS = {"name": 3.0, "muscles": 2.0, "description": 1.0}
+# Matches within one typo score less than exact ones
+FUZZY_PENALTY = 0.5
+# Shortest query token matched with typo tolerance
+MIN_FUZZY_LENGTH = 4
+# Longest term prefix indexed for typo tolerance
+MAX_FUZZY_PREFIX = 12
+# Tokens up to this length match so many terms that their scores are precomputed
+MAX_PRECOMPUTED_PREFIX = 2
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def deletes(word):
+    """Get the strings obtained by deleting one character of a word."""
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+### Prefix index of the exercise catalog
+class ExerciseIndex:
+    def __init__(self, exercises, version=None):
+        """
+        Build the index.
+
+        Parameters:
+            exercises (list): The exercise documents, with a name, description and muscles.
+            version (int, optional): The catalog version the exercises were loaded at. Defaults to None.
+        """
+        self.version = version
+        self.exercises = list(exercises)
+        self._muscles = [set(exercise.get("muscles") or []) for exercise in self.exercises]
+        self._names = [(exercise.get("name") or "").lower() for exercise in self.exercises]
+
+        # term -> {exercise position: best field weight}
+        postings = {}
+        for position, exercise in enumerate(self.exercises):
+            for field, weight in FIELD_WEIGHTS.items():
+                value = exercise.get(field) or []
+                texts = [value] if isinstance(value, str) else value
+                for text in texts:
+                    for term in tokenize(text):
+                        matches = postings.setdefault(term, {})
+                        if matches.get(position, 0) < weight:
+                            matches[position] = weight
+        self._postings = postings
+        self._terms = sorted(postings)
+
+        # One-deletion neighborhoods of the term prefixes, for typo tolerance
+        fuzzy = {}
+        for term in self._terms:
+            for length in range(MIN_FUZZY_LENGTH - 1, min(len(term), MAX_FUZZY_PREFIX) + 1):
+                prefix = term[:length]
+                for variant in deletes(prefix) | {prefix}:
+                    fuzzy.setdefault(variant, set()).add(prefix)
+        self._fuzzy = fuzzy
+
+        # The first keystrokes are the most frequent and the most expensive queries
+        self._precomputed = {}
+        for term in self._terms:
+            for length in range(1, min(len(term), MAX_PRECOMPUTED_PREFIX) + 1):
+                if term[:length] not in self._precomputed:
+                    self._precomputed[term[:length]] = self._match_token(term[:length])
+
+    def _terms_with_prefix(self, prefix):
+        start = bisect_left(self._terms, prefix)
+        for term in self._terms[start:]:
+            if not term.startswith(prefix):
+                break
+            yield term
+
+    def _match_token(self, token):
+        if token in self._precomputed:
+            return dict(self._precomputed[token])
+
+        # position -> best score for this token
+        scores = {}
+        for term in self._terms_with_prefix(token):
+            for position, weight in self._postings[term].items():
+                if scores.get(position, 0) < weight:
+                    scores[position] = weight
+
+        if len(token) >= MIN_FUZZY_LENGTH:
+            prefixes = set()
+            for variant in deletes(token) | {token}:
+                prefixes |= self._fuzzy.get(variant, set())
+            prefixes.discard(token)
+            for prefix in prefixes:
+                for term in self._terms_with_prefix(prefix):
+                    for position, weight in self._postings[term].items():
+                        score = weight * FUZZY_PENALTY
+                        if scores.get(position, 0) < score:
+                            scores[position] = score
+        return scores
+
+    def search(self, prefix, muscles=None, limit=10):
+        """
+        Find the exercises matching what the user typed so far.
+
+        Every token of the prefix must match the start of a word of the name, muscles
+        or description of the exercise, with at most one typo for tokens of
+        MIN_FUZZY_LENGTH characters or more.
+
+        Parameters:
+            prefix (str): The text typed by the user.
+            muscles (List[str], optional): Muscles the exercises must all work. Defaults to None.
+            limit (int, optional): The maximum number of results. Defaults to 10.
+
+        Returns:
+            list: The matching exercise documents, best match first.
+        """
+        muscles = set(muscles or [])
+        tokens = tokenize(prefix or "")
+
+        if not tokens:
+            positions = range(len(self.exercises))
+            scores = {position: 0 for position in positions}
+        else:
+            scores = None
+            for token in tokens:
+                token_scores = self._match_token(token)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {position: score + token_scores[position] for position, score in scores.items() if position in token_scores}
+                if not scores:
+                    return []
+
+            # Names starting with the whole query rank first
+            query = " ".join(tokens)
+            for position in scores:
+                if self._names[position].startswith(query):
+                    scores[position] += FIELD_WEIGHTS["name"]
+
+        candidates = [
+            position for position in scores
+            if muscles <= self._muscles[position]
+        ] if muscles else scores
+        best = heapq.nsmallest(limit, candidates, key=lambda position: (-scores[position], len(self._names[position]), self._names[position]))
+        return [self.exercises[position] for position in best]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(collection, version):
+    """
+    Get the index of the exercise catalog, rebuilding it when the catalog version changed.
+
+    Parameters:
+        collection (Collection): The exercises collection.
+        version (int): The current catalog version.
+
+    Returns:
+        ExerciseIndex: The index.
+    """
+    global _index
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = ExerciseIndex(collection.find(), version=version)
+        return _index
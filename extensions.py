@@ -0,0 +1,8 @@
+from flask_bcrypt import Bcrypt
+from flask_cors import CORS
+from flask_jwt_extended import JWTManager
+
+# Bound to the app in create_app
+bcrypt = Bcrypt()
+cors = CORS()
+jwt = JWTManager()
@@ -0,0 +1,45 @@
+# Imported under another name, gunicorn reads every module-level name as a setting and
+# "config" is one of them
+from decouple import config as env
+
+# Serve the app created by app.create_app()
+wsgi_app = "app:app"
+
+bind = env('GUNICORN_BIND', default='0.0.0.0:8000')
+# Socket.IO sessions live in the worker that opened them, and gunicorn cannot route the
+# long-polling requests of a session back to it, so a single worker serves everything by
+# default. To scale out, run several single-worker instances behind a load balancer with
+# sticky sessions, and set SOCKETIO_MESSAGE_QUEUE so that every instance can emit to
+# every client.
+workers = env('GUNICORN_WORKERS', default=1, cast=int)
+# Long-polling requests wait up to the ping interval (25s by default) and WebSockets stay
+# open, each would hold a thread of a gthread worker. Under gevent they hold a greenlet, so
+# the single worker serves as many clients as it has connections.
+worker_class = env('GUNICORN_WORKER_CLASS', default='geventwebsocket.gunicorn.workers.GeventWebSocketWorker')
+# Sizing: every Socket.IO client takes one connection, every HTTP request one more while it
+# runs. Requests mostly wait on MongoDB, so GraphQL executions are capped below both these
+# connections and the MongoDB pool (MONGO_MAX_POOL_SIZE), see GRAPHQL_MAX_CONCURRENCY in
+# app.py. Raise the connections with the number of clients, the pool with the database.
+worker_connections = env('GUNICORN_WORKER_CONNECTIONS', default=1000, cast=int)
+# Only read by the gthread worker, which also needs SOCKETIO_ASYNC_MODE=threading
+threads = env('GUNICORN_THREADS', default=16, cast=int)
+
+if 'gevent' in worker_class:
+    # The app is preloaded in the master, patch before it imports pymongo and creates its locks
+    from gevent import monkey
+    monkey.patch_all()
+
+# Import the app and build the schema once in the master, workers share it copy-on-write
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Connections opened in the master must not be used by the workers
+    from database.clients import reset_client
+    from realtime.bus import set_bus
+    from stats.runner import start_in_process
+
+    reset_client()
+    set_bus(None)
+    # Threads do not survive the fork, background jobs start in each worker
+    start_in_process()
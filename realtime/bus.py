@@ -0,0 +1,143 @@
+import json
+import threading
+
+from decouple import config
+
+from api.serialization import default
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+### Message bus
+class MessageBus:
+    """
+    Publish/subscribe channel used to fan events out to every worker process.
+
+    Subclasses implement publish and may hook the first subscription and last
+    unsubscription of a channel to start or stop listening to the broker.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, channel, handler):
+        """
+        Call handler with every message published on the channel.
+
+        Parameters:
+            channel (str): The name of the channel.
+            handler (callable): Called with the channel and the message.
+
+        Returns:
+            callable: Unsubscribes the handler when called.
+        """
+        with self._lock:
+            handlers = self._handlers.setdefault(channel, [])
+            handlers.append(handler)
+            first = len(handlers) == 1
+        if first:
+            self._on_subscribe(channel)
+
+        def unsubscribe():
+            with self._lock:
+                handlers = self._handlers.get(channel, [])
+                if handler not in handlers:
+                    return
+                handlers.remove(handler)
+                last = not handlers
+                if last:
+                    del self._handlers[channel]
+            if last:
+                self._on_unsubscribe(channel)
+
+        return unsubscribe
+
+    def _on_subscribe(self, channel):
+        pass
+
+    def _on_unsubscribe(self, channel):
+        pass
+
+    def _dispatch(self, channel, message):
+        with self._lock:
+            handlers = list(self._handlers.get(channel, []))
+        for handler in handlers:
+            handler(channel, message)
+
+
+class InProcessBus(MessageBus):
+    """Delivers messages to the subscribers of the current process only."""
+
+    def publish(self, channel, message):
+        self._dispatch(channel, message)
+
+
+class RedisBus(MessageBus):
+    """Delivers messages to the subscribers of every process through Redis pub/sub."""
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("The redis package is required to use a redis:// message bus")
+        super().__init__()
+        self._redis = redis.Redis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._thread = None
+
+    def publish(self, channel, message):
+        self._redis.publish(channel, json.dumps(message, default=default))
+
+    def _on_subscribe(self, channel):
+        self._pubsub.subscribe(**{channel: self._on_message})
+        # The listener thread can only start once a channel is subscribed
+        if self._thread is None:
+            self._thread = self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _on_unsubscribe(self, channel):
+        self._pubsub.unsubscribe(channel)
+
+    def _on_message(self, message):
+        channel = message["channel"].decode("utf-8")
+        self._dispatch(channel, json.loads(message["data"]))
+
+
+def create_bus(url):
+    """
+    Create a message bus from its URL.
+
+    Parameters:
+        url (str): "memory://" for an in-process bus, or a redis:// URL.
+
+    Returns:
+        MessageBus: The message bus.
+    """
+    if url.startswith("memory://"):
+        return InProcessBus()
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBus(url)
+    raise ValueError(f"Unsupported message bus URL '{url}'")
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    # Created on first use so that each worker process gets its own connection
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = create_bus(config('REALTIME_BUS_URL', default='memory://'))
+    return _bus
+
+
+def set_bus(bus):
+    global _bus
+    with _bus_lock:
+        _bus = bus
@@ -0,0 +1,33 @@
+import logging
+
+from .bus import get_bus
+
+logger = logging.getLogger(__name__)
+
+
+def workout_channel(user_id):
+    return f"workouts:{user_id}"
+
+
+def publish_workout_change(user_id, kind, workout_id, workout=None):
+    """
+    Notify the subscribers of a user that one of their workouts changed.
+
+    Delivery is best effort: failures are logged, subscribers catch up by querying.
+
+    Parameters:
+        user_id (str): The ID of the user.
+        kind (str): "created", "updated" or "deleted".
+        workout_id (str): The ID of the workout.
+        workout (dict, optional): The workout document. Defaults to None for deletions.
+    """
+    # The write is already committed, failing the mutation would make clients retry it
+    try:
+        get_bus().publish(workout_channel(user_id), {
+            "kind": kind,
+            "user_id": str(user_id),
+            "workout_id": str(workout_id),
+            "workout": workout
+        })
+    except Exception:
+        logger.exception("Could not publish %s change of workout %s", kind, workout_id)
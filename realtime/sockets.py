@@ -0,0 +1,152 @@
+import threading
+
+from flask import request
+from flask_socketio import SocketIO
+from graphql import parse, validate, execute, get_operation_ast, GraphQLError
+from graphql.execution.values import get_argument_values, get_variable_values
+
+from api.execution import format_result
+from .bus import get_bus
+from .events import workout_channel
+
+socketio = SocketIO()
+
+
+### Subscriptions of the sockets connected to this process
+class SubscriptionManager:
+    def __init__(self):
+        self.schema = None
+        self._subscriptions = {}
+        self._keys_by_user = {}
+        self._unsubscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, sid, subscription_id, query, variables=None, operation_name=None):
+        """
+        Register a GraphQL subscription for a socket.
+
+        Parameters:
+            sid (str): The Socket.IO session ID.
+            subscription_id (str): The ID chosen by the client for the subscription.
+            query (str): The GraphQL subscription document.
+            variables (dict, optional): The variables of the operation. Defaults to None.
+            operation_name (str, optional): The name of the operation to execute. Defaults to None.
+
+        Returns:
+            List[str]: The errors that prevented the subscription, empty on success.
+        """
+        graphql_schema = self.schema.graphql_schema
+        try:
+            document = parse(query)
+        except GraphQLError as error:
+            return [str(error)]
+
+        errors = validate(graphql_schema, document)
+        if errors:
+            return [str(error) for error in errors]
+
+        operation = get_operation_ast(document, operation_name)
+        if operation is None or operation.operation.value != "subscription":
+            return ["Operation must be a subscription"]
+
+        coerced_variables = get_variable_values(graphql_schema, operation.variable_definitions or [], variables or {})
+        if isinstance(coerced_variables, list):
+            return [str(error) for error in coerced_variables]
+
+        # Subscriptions have a single root field, its userId picks the channel to listen to
+        field_node = operation.selection_set.selections[0]
+        field_def = graphql_schema.subscription_type.fields[field_node.name.value]
+        user_id = get_argument_values(field_def, field_node, coerced_variables)["user_id"]
+
+        key = (sid, subscription_id)
+        with self._lock:
+            self._subscriptions[key] = {
+                "user_id": user_id,
+                "document": document,
+                "variables": variables or {},
+                "operation_name": operation_name
+            }
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            # Listen to each user's channel once per process
+            if user_id not in self._unsubscribers:
+                self._unsubscribers[user_id] = get_bus().subscribe(workout_channel(user_id), self._on_message)
+        return []
+
+    def complete(self, sid, subscription_id):
+        with self._lock:
+            subscription = self._subscriptions.pop((sid, subscription_id), None)
+            if subscription is None:
+                return
+            user_id = subscription["user_id"]
+            keys = self._keys_by_user[user_id]
+            keys.discard((sid, subscription_id))
+            if not keys:
+                del self._keys_by_user[user_id]
+                self._unsubscribers.pop(user_id)()
+
+    def disconnect(self, sid):
+        with self._lock:
+            subscription_ids = [key[1] for key in self._subscriptions if key[0] == sid]
+        for subscription_id in subscription_ids:
+            self.complete(sid, subscription_id)
+
+    def _on_message(self, channel, message):
+        with self._lock:
+            subscriptions = [
+                (key, self._subscriptions[key])
+                for key in self._keys_by_user.get(message["user_id"], ())
+            ]
+
+        for (sid, subscription_id), subscription in subscriptions:
+            # The event is the root value the subscription's selection set is resolved against
+            result = execute(
+                self.schema.graphql_schema,
+                subscription["document"],
+                root_value=message,
+                variable_values=subscription["variables"],
+                operation_name=subscription["operation_name"]
+            )
+            socketio.emit("next", {"id": subscription_id, "payload": format_result(result)}, to=sid)
+
+
+subscriptions = SubscriptionManager()
+
+
+@socketio.on("subscribe")
+def on_subscribe(data):
+    subscription_id = data.get("id")
+    errors = subscriptions.subscribe(
+        request.sid,
+        subscription_id,
+        data.get("query", ""),
+        data.get("variables"),
+        data.get("operationName")
+    )
+    if errors:
+        socketio.emit("error", {"id": subscription_id, "payload": {"errors": errors}}, to=request.sid)
+
+
+@socketio.on("complete")
+def on_complete(data):
+    subscriptions.complete(request.sid, data.get("id"))
+
+
+@socketio.on("disconnect")
+def on_disconnect():
+    subscriptions.disconnect(request.sid)
+
+
+def init_app(app, schema, message_queue=None, async_mode=None):
+    """
+    Serve the workout subscriptions over Socket.IO.
+
+    Parameters:
+        app (Flask): The app.
+        schema (Schema): The GraphQL schema resolving the subscriptions.
+        message_queue (str, optional): The URL of the queue shared by the server instances,
+            e.g. "redis://", when several run behind a sticky load balancer. Defaults to None.
+        async_mode (str, optional): "gevent" under the gunicorn gevent worker, "threading" under
+            gthread. Defaults to None, which picks gevent when it is installed.
+    """
+    subscriptions.schema = schema
+    socketio.init_app(app, cors_allowed_origins="*", message_queue=message_queue, async_mode=async_mode)
@@ -0,0 +1,18 @@
+import graphene
+
+from workout.schema import Query as WorkoutQuery, Mutation as WorkoutMutation, Subscription as WorkoutSubscription
+from user_auth.schema import Query as UserAuthQuery
+from exercise.schema import Query as ExerciseQuery
+from stats.schema import Query as StatsQuery
+
+class MergedQuery(WorkoutQuery, UserAuthQuery, ExerciseQuery, StatsQuery):
+    pass
+
+class MergedMutation(WorkoutMutation):
+    pass
+
+class MergedSubscription(WorkoutSubscription):
+    pass
+
+### Main entry point for the API
+schema = graphene.Schema(query=MergedQuery, mutation=MergedMutation, subscription=MergedSubscription)
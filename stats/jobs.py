@@ -0,0 +1,211 @@
+from datetime import datetime, timedelta, timezone
+import math
+
+from pymongo import UpdateOne, ReplaceOne, DeleteOne, ASCENDING, DESCENDING
+
+from workout.sync import changes_since, COUNTERS_COLLECTION
+
+
+def week_of(date):
+    """
+    Get the ISO week of a workout date.
+
+    Parameters:
+        date (str): The date of the workout, formatted as "%Y-%m-%d".
+
+    Returns:
+        tuple: The week ("2023-W27"), and its first and last dates formatted as "%Y-%m-%d".
+    """
+    day = datetime.strptime(date[:10], "%Y-%m-%d").date()
+    start = day - timedelta(days=day.weekday())
+    end = start + timedelta(days=6)
+    return day.strftime("%G-W%V"), start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
+def percentile(values, fraction):
+    """Get the nearest-rank percentile of a list of values, or None if it is empty."""
+    values = sorted(values)
+    if not values:
+        return None
+    rank = max(math.ceil(fraction * len(values)) - 1, 0)
+    return values[rank]
+
+
+### Cross-user exercise statistics
+class StatsAggregator:
+    """
+    Incrementally aggregates the per-user workout collections into summary collections.
+
+    Each user collection is read through its change feed (see workout/sync.py) from its
+    checkpoint, so a run only reads the workouts created, updated or deleted since the
+    previous run. The checkpoint is kept next to the change counter of the user, so that
+    a run only visits the users whose counter moved past it. The week and exercise each workout was counted under are remembered,
+    so that moving or deleting a workout recounts the week it left. Every write is
+    idempotent (recounts and recomputed maxima and rollups), so a batch processed again
+    after a crash, before its checkpoint was saved, does not skew the summaries.
+    """
+
+    def __init__(self, workouts_db, stats_db, batch_size=1000):
+        self.workouts_db = workouts_db
+        self.checkpoints = workouts_db[COUNTERS_COLLECTION]
+        self.counted = stats_db["stats_counted_workouts"]
+        self.user_weekly = stats_db["stats_user_weekly"]
+        self.user_max = stats_db["stats_user_max"]
+        self.popularity = stats_db["stats_exercise_popularity"]
+        self.benchmarks = stats_db["stats_exercise_benchmarks"]
+        self.batch_size = batch_size
+
+    def ensure_indexes(self):
+        self.user_weekly.create_index([("week", ASCENDING), ("exercise_id", ASCENDING)])
+        self.user_max.create_index([("exercise_id", ASCENDING)])
+        self.popularity.create_index([("week", ASCENDING), ("count", DESCENDING)])
+
+    def run(self):
+        """
+        Aggregate the workouts changed since the previous run, for every user.
+
+        Returns:
+            int: The number of changes processed.
+        """
+        processed = 0
+        # Users without a checkpoint are aggregated from the start, which is idempotent
+        written = self.checkpoints.find(
+            {"$expr": {"$gt": ["$seq", {"$ifNull": ["$stats_seq", 0]}]}},
+            {"stats_seq": 1}
+        )
+        for counter in written:
+            processed += self.aggregate_user(counter["_id"], counter.get("stats_seq", 0))
+        return processed
+
+    def aggregate_user(self, user_id, since=0):
+        user_collection = self.workouts_db[f"user_{user_id}"]
+
+        processed = 0
+        while True:
+            changes, cursor, has_more = changes_since(self.workouts_db, user_id, since, self.batch_size)
+            if changes:
+                self._aggregate_batch(user_id, user_collection, changes)
+                since = cursor
+                self.checkpoints.update_one(
+                    {"_id": user_id},
+                    {"$set": {"stats_seq": since, "stats_updated_at": datetime.now(timezone.utc)}}
+                )
+                processed += len(changes)
+            if not has_more:
+                return processed
+
+    def _aggregate_batch(self, user_id, user_collection, changes):
+        # (week, exercise ID) -> exercise, for the weeks to recount
+        weeks = {}
+        exercises = {}
+        counted_updates = []
+
+        for kind, doc in changes:
+            counted_id = f"{user_id}:{doc['_id']}"
+            # The week the workout was counted under, before it was moved or deleted
+            previous = self.counted.find_one({"_id": counted_id})
+            if previous:
+                weeks[(tuple(previous["week"]), previous["exercise_id"])] = previous["exercise"]
+
+            exercise = doc.get("exercise") if kind == "upsert" else None
+            if not exercise or not doc.get("date"):
+                if previous:
+                    counted_updates.append(DeleteOne({"_id": counted_id}))
+                continue
+
+            exercise_id = str(exercise["_id"])
+            week = week_of(doc["date"])
+            weeks[(week, exercise_id)] = exercise
+            counted_updates.append(ReplaceOne(
+                {"_id": counted_id},
+                {"week": list(week), "exercise_id": exercise_id, "exercise": exercise},
+                upsert=True
+            ))
+
+        if counted_updates:
+            self.counted.bulk_write(counted_updates, ordered=False)
+
+        # Recount the user's done workouts of each touched week, rather than incrementing
+        weekly_updates = []
+        for ((week, start, end), exercise_id), exercise in weeks.items():
+            exercises[exercise_id] = exercise
+            count = user_collection.count_documents({"exercise._id": exercise["_id"], "date": {"$gte": start, "$lte": end}, "done": True})
+            weekly_id = f"{user_id}:{week}:{exercise_id}"
+            if count:
+                weekly_updates.append(UpdateOne(
+                    {"_id": weekly_id},
+                    {"$set": {"user_id": user_id, "week": week, "exercise_id": exercise_id, "count": count}},
+                    upsert=True
+                ))
+            else:
+                weekly_updates.append(DeleteOne({"_id": weekly_id}))
+
+        if weekly_updates:
+            self.user_weekly.bulk_write(weekly_updates, ordered=False)
+
+        # Recompute the maxima, a deleted or edited workout may have held them
+        for exercise_id, exercise in exercises.items():
+            self._recompute_max(user_id, user_collection, exercise_id, exercise)
+
+        for (week, _, _), exercise_id in weeks:
+            self._rollup_popularity(week, exercise_id, exercises[exercise_id])
+        for exercise_id, exercise in exercises.items():
+            self._rollup_benchmark(exercise_id, exercise)
+
+    def _recompute_max(self, user_id, user_collection, exercise_id, exercise):
+        result = list(user_collection.aggregate([
+            {"$match": {"exercise._id": exercise["_id"], "done": True}},
+            {"$group": {"_id": None, "max_weight": {"$max": "$weight"}, "max_duration": {"$max": "$duration"}}}
+        ]))
+        maxima = {field: result[0][field] for field in ("max_weight", "max_duration") if result and result[0].get(field) is not None}
+
+        if maxima:
+            self.user_max.replace_one(
+                {"_id": f"{user_id}:{exercise_id}"},
+                {"user_id": user_id, "exercise_id": exercise_id, **maxima},
+                upsert=True
+            )
+        else:
+            self.user_max.delete_one({"_id": f"{user_id}:{exercise_id}"})
+
+    def _rollup_popularity(self, week, exercise_id, exercise):
+        result = list(self.user_weekly.aggregate([
+            {"$match": {"week": week, "exercise_id": exercise_id}},
+            {"$group": {"_id": None, "count": {"$sum": "$count"}}}
+        ]))
+        count = result[0]["count"] if result else 0
+        if not count:
+            self.popularity.delete_one({"_id": f"{week}:{exercise_id}"})
+            return
+        self.popularity.update_one(
+            {"_id": f"{week}:{exercise_id}"},
+            {"$set": {"week": week, "exercise_id": exercise_id, "exercise": exercise, "count": count}},
+            upsert=True
+        )
+
+    def _rollup_benchmark(self, exercise_id, exercise):
+        weights, durations = [], []
+        users = 0
+        for user_max in self.user_max.find({"exercise_id": exercise_id}):
+            users += 1
+            if user_max.get("max_weight") is not None:
+                weights.append(user_max["max_weight"])
+            if user_max.get("max_duration") is not None:
+                durations.append(user_max["max_duration"])
+
+        if not users:
+            self.benchmarks.delete_one({"_id": exercise_id})
+            return
+        self.benchmarks.update_one(
+            {"_id": exercise_id},
+            {"$set": {
+                "exercise": exercise,
+                "users": users,
+                "median_max_weight": percentile(weights, 0.5),
+                "p90_max_weight": percentile(weights, 0.9),
+                "median_max_duration": percentile(durations, 0.5),
+                "p90_max_duration": percentile(durations, 0.9),
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }},
+            upsert=True
+        )
@@ -0,0 +1,18 @@
+from graphene import ObjectType, String, Int, Field, Float
+
+from exercise.models import Exercise
+
+#### GraphQL Stats Objects
+class PopularExercise(ObjectType):
+    exercise = Field(Exercise)
+    week = String()
+    count = Int(default_value=0)
+    
+class ExerciseBenchmark(ObjectType):
+    exercise = Field(Exercise)
+    users = Int(default_value=0)
+    median_max_weight = Float()
+    p90_max_weight = Float()
+    median_max_duration = Float()
+    p90_max_duration = Float()
+    updated_at = String()
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+import socket
+import threading
+
+from decouple import config
+from pymongo.errors import DuplicateKeyError
+
+from database.clients import LazyDatabase
+from .jobs import StatsAggregator
+
+logger = logging.getLogger(__name__)
+
+# MongoDB handles, connected on first use in each worker process
+db = LazyDatabase("workouttracker")
+db_user_workouts = LazyDatabase("user_workouts")
+leases_collection = db["stats_leases"]
+
+STATS_INTERVAL = config('STATS_INTERVAL', default=300, cast=float)
+STATS_BATCH_SIZE = config('STATS_BATCH_SIZE', default=1000, cast=int)
+
+
+### Scheduling
+class Lease:
+    """
+    Lets a single process run a job at a time, across workers and machines.
+
+    The lease expires after ttl seconds, so a crashed owner is replaced on a later run.
+    """
+
+    def __init__(self, collection, name, ttl):
+        self.collection = collection
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+
+    def acquire(self):
+        now = datetime.now(timezone.utc)
+        try:
+            self.collection.update_one(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Another process holds a lease that has not expired
+            return False
+        return True
+
+    def release(self):
+        self.collection.delete_one({"_id": self.name, "owner": self.owner})
+
+
+class JobRunner:
+    def __init__(self, job, interval, lease):
+        """
+        Run a job every interval seconds in a background thread.
+
+        Parameters:
+            job (callable): The job to run.
+            interval (float): The number of seconds between two runs.
+            lease (Lease): The lease the process must hold to run the job.
+        """
+        self.job = job
+        self.interval = interval
+        self.lease = lease
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        # The owner renews its lease on each run, the other processes skip
+        if not self.lease.acquire():
+            return None
+        return self.job()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Stats job failed")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="stats-runner", daemon=True)
+        self._thread.start()
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def stop(self):
+        self._stop.set()
+        self.join()
+        self.lease.release()
+
+
+def create_runner(interval=STATS_INTERVAL, batch_size=STATS_BATCH_SIZE):
+    aggregator = StatsAggregator(db_user_workouts, db, batch_size=batch_size)
+
+    def job():
+        aggregator.ensure_indexes()
+        processed = aggregator.run()
+        logger.info("Aggregated %d workouts", processed)
+        return processed
+
+    # The lease outlives the interval, so that its owner keeps it from one run to the next
+    return JobRunner(job, interval, Lease(leases_collection, "stats", ttl=max(2 * interval, 600)))
+
+
+_runner = None
+
+
+def start_in_process():
+    """
+    Start the stats runner in a thread of the current process when STATS_RUNNER is "inprocess".
+
+    Must be called after forking, e.g. from gunicorn's post_fork hook. With the default
+    STATS_RUNNER ("worker") the statistics are aggregated by `python -m stats.worker`.
+    """
+    global _runner
+    if config('STATS_RUNNER', default='worker') != 'inprocess' or _runner is not None:
+        return _runner
+    _runner = create_runner()
+    _runner.start()
+    return _runner
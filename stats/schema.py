@@ -0,0 +1,56 @@
+from datetime import datetime
+from graphene import ObjectType, List, String, Int, Field
+
+from .models import PopularExercise, ExerciseBenchmark
+from database.clients import LazyDatabase
+from database.routing import workload, routed, max_time_ms, ANALYTICS
+
+# MongoDB handles, connected on first use in each worker process
+db = LazyDatabase("workouttracker")
+popularity_collection = db["stats_exercise_popularity"]
+benchmarks_collection = db["stats_exercise_benchmarks"]
+
+### Available Queries
+class Query(ObjectType):
+    popular_exercises = List(PopularExercise, week=String(), limit=Int(default_value=10))
+    exercise_benchmarks = Field(ExerciseBenchmark, exercise_id=String(required=True))
+    
+    @workload(ANALYTICS)
+    def resolve_popular_exercises(self, info, week=None, limit=10):
+        """
+        Retrieves the most logged exercises of a week, across all users.
+
+        The counts are precomputed by the stats runner, see stats/runner.py.
+
+        Args:
+            info (object): The GraphQL info object.
+            week (str, optional): The ISO week, e.g. "2023-W27". Defaults to the current week.
+            limit (int, optional): The maximum number of exercises, at most 100. Defaults to 10.
+
+        Returns:
+            List[PopularExercise]: The exercises, most logged first.
+        """
+        if week is None:
+            week = datetime.now().strftime("%G-W%V")
+        
+        cursor = routed(popularity_collection).find({"week": week}, max_time_ms=max_time_ms()).sort("count", -1).limit(min(max(limit, 0), 100))
+        
+        return [PopularExercise(exercise=doc["exercise"], week=doc["week"], count=doc["count"]) for doc in cursor]
+    
+    @workload(ANALYTICS)
+    def resolve_exercise_benchmarks(self, info, exercise_id):
+        """
+        Retrieves the typical max weight and max duration users reach on an exercise.
+
+        Args:
+            info (object): The GraphQL info object.
+            exercise_id (str): The ID of the exercise.
+
+        Returns:
+            ExerciseBenchmark: The benchmark, or None if nobody completed the exercise yet.
+        """
+        doc = routed(benchmarks_collection).find_one({"_id": exercise_id}, max_time_ms=max_time_ms())
+        if not doc:
+            return None
+        doc.pop("_id")
+        return ExerciseBenchmark(**doc)
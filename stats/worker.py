@@ -0,0 +1,34 @@
+"""
+Aggregate the cross-user exercise statistics.
+
+Usage:
+    python -m stats.worker [--once] [--interval SECONDS]
+"""
+import argparse
+import logging
+
+from .runner import create_runner, STATS_INTERVAL
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate the cross-user exercise statistics.")
+    parser.add_argument("--once", action="store_true", help="run a single aggregation and exit")
+    parser.add_argument("--interval", type=float, default=STATS_INTERVAL, help="seconds between two runs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    runner = create_runner(interval=args.interval)
+
+    if args.once:
+        runner.run_once()
+        return
+
+    runner.start()
+    try:
+        runner.join()
+    except KeyboardInterrupt:
+        runner.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import os
+import sys
+import pytest
+from flask import Flask
+from mongomock import MongoClient
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api.routes
+import exercise.catalog
+from api import persisted
+from api.caching import ResponseCache, cache_control, make_etag, parse_max_ages, root_fields
+
+MAX_AGES = {"allExercises": 3600, "allPoses": 600}
+
+@pytest.fixture
+def results(monkeypatch):
+    """
+    A fixture that sets up the results the GraphQL operations return, and a fixed catalog version.
+
+    return: The list of results, returned in order.
+    """
+    results = []
+    monkeypatch.setattr(api.routes, "catalog_version", lambda: 1)
+    monkeypatch.setattr(api.routes, "execute_operation", lambda schema, operation, context: results.pop(0))
+    yield results
+
+@pytest.fixture
+def client(results):
+    """
+    A fixture that sets up a Flask app serving the GraphQL blueprint with a response cache.
+
+    return: The test client.
+    """
+    app = Flask(__name__)
+    app.config["GRAPHQL_CACHE_MAX_AGES"] = MAX_AGES
+    app.extensions["response_cache"] = ResponseCache(16)
+    persisted.init_app(app)
+    app.register_blueprint(api.routes.api)
+    yield app.test_client()
+
+class TestCaching:
+    def test_parse_max_ages(self):
+        assert parse_max_ages("allExercises=3600, allPoses=600") == MAX_AGES
+
+    @pytest.mark.parametrize("query, expected_fields", [
+        # TEST CASE 1 - Single root field
+        ("{ allExercises { name } }", ["allExercises"]),
+        # TEST CASE 2 - Several root fields of a named operation
+        ("query Catalog { allExercises { name } allPoses { name } }", ["allExercises", "allPoses"]),
+        # TEST CASE 3 - Fragment spread on the root type
+        ("query { ...Catalog } fragment Catalog on Query { allPoses { name } }", None),
+        # TEST CASE 4 - Invalid document
+        ("{ allExercises {", None),
+    ])
+    def test_root_fields(self, query, expected_fields):
+        assert root_fields(query) == expected_fields
+
+    @pytest.mark.parametrize("fields, expected_header", [
+        # TEST CASE 1 - Catalog field
+        (["allExercises"], "public, max-age=3600"),
+        # TEST CASE 2 - Shortest lifetime wins
+        (["allExercises", "allPoses", "__typename"], "public, max-age=600"),
+        # TEST CASE 3 - User data is never cached
+        (["allExercises", "workouts"], None),
+        # TEST CASE 4 - Unknown root fields
+        (None, None),
+    ])
+    def test_cache_control(self, fields, expected_header):
+        assert cache_control(fields, MAX_AGES) == expected_header
+
+    def test_etag_changes_with_catalog_version(self):
+        etag = make_etag(1, "{ allPoses { name } }", {}, None)
+
+        assert etag == make_etag(1, "{ allPoses { name } }", {}, None)
+        assert etag != make_etag(2, "{ allPoses { name } }", {}, None)
+        assert etag != make_etag(1, "{ allPoses { name } }", {"a": 1}, None)
+
+    def test_bump_command(self, monkeypatch, capsys):
+        monkeypatch.setattr(exercise.catalog, "meta_collection", MongoClient().db.meta)
+        # Restored after the test, so that the version bumped here is not cached for the others
+        monkeypatch.setattr(exercise.catalog, "_cached_version", None)
+        monkeypatch.setattr(sys, "argv", ["catalog", "bump"])
+
+        exercise.catalog.main()
+        exercise.catalog.main()
+
+        assert capsys.readouterr().out == "1\n2\n"
+        # Bumping refreshes the version cached by this process
+        assert exercise.catalog.catalog_version() == 2
+
+    def test_response_cache_evicts_least_recently_used(self):
+        cache = ResponseCache(max_size=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get("a") == "1"
+        assert cache.get("b") is None
+        assert cache.get("c") == "3"
+
+class TestGraphQLGet:
+    def test_catalog_response_is_public(self, client, results):
+        results.append({"data": {"allExercises": []}})
+
+        response = client.get("/graphql?query={allExercises{name}}")
+        etag = response.headers["ETag"]
+
+        assert response.headers["Cache-Control"] == "public, max-age=3600"
+        assert etag.startswith('W/"')
+        assert client.get("/graphql?query={allExercises{name}}", headers={"If-None-Match": etag}).status_code == 304
+
+    def test_errors_are_not_cached(self, client, results):
+        results.append({"data": None, "errors": ["database unavailable"]})
+        results.append({"data": {"allExercises": []}})
+
+        response = client.get("/graphql?query={allExercises{name}}")
+
+        assert response.headers["Cache-Control"] == "private, no-cache"
+        assert "ETag" not in response.headers
+        # The next request executes the operation again
+        assert client.get("/graphql?query={allExercises{name}}").json == {"data": {"allExercises": []}}
+
+    @pytest.mark.parametrize("variables", [
+        # TEST CASE 1 - Invalid JSON
+        "{",
+        # TEST CASE 2 - An array
+        "[1]",
+        # TEST CASE 3 - A scalar
+        "1",
+    ])
+    def test_invalid_variables_are_rejected(self, client, results, variables):
+        response = client.get("/graphql", query_string={"query": "{allExercises{name}}", "variables": variables})
+
+        assert response.status_code == 400
+        assert results == []
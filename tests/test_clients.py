@@ -0,0 +1,37 @@
+import os
+import sys
+import pytest
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import clients
+
+@pytest.fixture
+def fresh_clients(monkeypatch):
+    """
+    A fixture that resets the MongoDB client of the process around a test.
+
+    return: The clients module.
+    """
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:1")
+    clients.reset_client()
+    yield clients
+    clients.reset_client()
+
+class TestClients:
+    def test_handles_do_not_connect(self, fresh_clients):
+        collection = fresh_clients.LazyDatabase("workouttracker")["exercises"]
+
+        assert collection.name == "exercises"
+        assert fresh_clients._client is None
+
+    def test_client_is_reused_in_process(self, fresh_clients):
+        assert fresh_clients.get_client() is fresh_clients.get_client()
+
+    def test_client_is_recreated_after_fork(self, fresh_clients, monkeypatch):
+        parent_client = fresh_clients.get_client()
+
+        monkeypatch.setattr(os, "getpid", lambda: -1)
+
+        assert fresh_clients.get_client() is not parent_client
@@ -0,0 +1,95 @@
+import os
+import sys
+import threading
+import pytest
+from flask import Flask
+from graphene import ObjectType, Schema, String, Int, Field
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.execution import execute_operation, execute_batch, operation_type
+from exercise.loaders import request_cache
+
+class Query(ObjectType):
+    thread = String()
+    cache_id = String()
+
+    def resolve_thread(self, info):
+        return threading.current_thread().name
+
+    def resolve_cache_id(self, info):
+        return str(id(request_cache(info, "exercises")))
+
+class Increment(ObjectType):
+    value = Int()
+
+class Mutation(ObjectType):
+    increment = Field(Increment)
+
+    def resolve_increment(self, info):
+        cache = request_cache(info, "counter")
+        cache["value"] = cache.get("value", 0) + 1
+        return Increment(value=cache["value"])
+
+schema = Schema(query=Query, mutation=Mutation)
+
+@pytest.fixture
+def app():
+    """
+    A fixture that sets up a Flask app to run operations in a request context.
+
+    return: The Flask app.
+    """
+    yield Flask(__name__)
+
+class TestExecution:
+    @pytest.mark.parametrize("query, expected_type", [
+        # TEST CASE 1 - Anonymous query
+        ("{ thread }", "query"),
+        # TEST CASE 2 - Mutation
+        ("mutation { increment { value } }", "mutation"),
+        # TEST CASE 3 - Invalid document
+        ("{ thread", None),
+    ])
+    def test_operation_type(self, query, expected_type):
+        assert operation_type(query) == expected_type
+
+    def test_execute_operation_without_query(self):
+        assert execute_operation(schema, {}, {}) == {"errors": ["Must provide a query string"]}
+
+    @pytest.mark.parametrize("operation, expected_error", [
+        # TEST CASE 1 - Variables that are not an object
+        ({"query": "{ thread }", "variables": [1]}, "Variables must be a JSON object"),
+        # TEST CASE 2 - A query that is not a string
+        ({"query": 1}, "Must provide a query string"),
+        # TEST CASE 3 - An operation name that is not a string
+        ({"query": "{ thread }", "operationName": ["a"]}, "Operation name must be a string"),
+    ])
+    def test_invalid_operation_fails_alone_in_its_batch(self, app, operation, expected_error):
+        operations = [{"query": "{ thread }"}, operation, {"query": "mutation { increment { value } }"}]
+
+        with app.test_request_context("/graphql", method="POST"):
+            results = execute_batch(schema, operations, {}, max_workers=4)
+
+        assert results[1] == {"errors": [expected_error]}
+        assert "data" in results[0] and "data" in results[2]
+
+    def test_batch_queries_run_concurrently_and_share_context(self, app):
+        operations = [{"query": "{ thread cacheId }"} for _ in range(4)]
+        context = {}
+
+        with app.test_request_context("/graphql", method="POST"):
+            results = execute_batch(schema, operations, context, max_workers=4)
+
+        assert len(results) == 4
+        assert all(result["data"]["thread"].startswith("graphql-batch") for result in results)
+        assert {result["data"]["cacheId"] for result in results} == {str(id(context["exercises"]))}
+
+    def test_batch_with_mutation_runs_in_order(self, app):
+        operations = [{"query": "mutation { increment { value } }"} for _ in range(3)]
+
+        with app.test_request_context("/graphql", method="POST"):
+            results = execute_batch(schema, operations, {}, max_workers=4)
+
+        assert [result["data"]["increment"]["value"] for result in results] == [1, 2, 3]
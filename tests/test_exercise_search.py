@@ -0,0 +1,82 @@
+import os
+import sys
+import pytest
+from mongomock import MongoClient
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import exercise.schema
+import exercise.search
+from exercise.schema import Query
+from exercise.search import ExerciseIndex, get_index
+
+EXERCISES = [
+    {"_id": "1", "name": "Barbell Bench Press", "description": ["Press the bar from the chest."], "muscles": ["Chest", "Triceps"]},
+    {"_id": "2", "name": "Incline Bench Press", "description": ["Press on an inclined bench."], "muscles": ["Chest", "Shoulders"]},
+    {"_id": "3", "name": "Back Squat", "description": ["Squat with the bar on the back."], "muscles": ["Quadriceps", "Glutes"]},
+    {"_id": "4", "name": "Bent Over Row", "description": ["Pull the bar to the belly."], "muscles": ["Back", "Biceps"]},
+    {"_id": "5", "name": "Triceps Pushdown", "description": ["Push the cable down."], "muscles": ["Triceps"]},
+]
+
+@pytest.fixture
+def index():
+    """
+    A fixture that sets up an index of a small exercise catalog.
+
+    return: The exercise index.
+    """
+    yield ExerciseIndex(EXERCISES, version=1)
+
+@pytest.fixture
+def mock_exercises_collection(monkeypatch):
+    """
+    A fixture that sets up a mock exercises collection and catalog version for testing.
+
+    return: The mock exercises collection.
+    """
+    mock_collection = MongoClient().db.collection
+    mock_collection.insert_many([dict(exercise) for exercise in EXERCISES])
+
+    monkeypatch.setattr(exercise.schema, "exercises_collection", mock_collection)
+    monkeypatch.setattr(exercise.schema, "catalog_version", lambda: 1)
+    monkeypatch.setattr(exercise.search, "_index", None)
+
+    yield mock_collection
+
+class TestExerciseSearch:
+    @pytest.mark.parametrize("prefix, muscles, expected_ids", [
+        # TEST CASE 1 - Name prefix, names starting with the query first
+        ("ben", None, ["4", "1", "2"]),
+        # TEST CASE 2 - Several tokens must all match
+        ("bench inc", None, ["2"]),
+        # TEST CASE 3 - Typo in a token
+        ("bemch", None, ["1", "2"]),
+        # TEST CASE 4 - Muscle filter
+        ("press", ["Triceps"], ["1"]),
+        # TEST CASE 5 - Matches on muscles rank below matches on names
+        ("tric", None, ["5", "1"]),
+        # TEST CASE 6 - Empty prefix lists the exercises by name
+        ("", ["Chest"], ["1", "2"]),
+        # TEST CASE 7 - No match
+        ("deadlift", None, []),
+    ])
+    def test_search(self, index, prefix, muscles, expected_ids):
+        result = index.search(prefix, muscles)
+
+        assert [exercise["_id"] for exercise in result] == expected_ids
+
+    def test_limit(self, index):
+        assert len(index.search("b", limit=2)) == 2
+
+    def test_index_is_rebuilt_when_catalog_changes(self, mock_exercises_collection, monkeypatch):
+        monkeypatch.setattr(exercise.search, "_index", None)
+        first = get_index(mock_exercises_collection, 1)
+
+        assert get_index(mock_exercises_collection, 1) is first
+        assert get_index(mock_exercises_collection, 2) is not first
+
+    def test_resolve_exercise_search(self, mock_exercises_collection):
+        result = Query().resolve_exercise_search(None, "squ", limit=5)
+
+        assert [exercise.name for exercise in result] == ["Back Squat"]
@@ -0,0 +1,31 @@
+import os
+import sys
+from gunicorn.app.base import Application
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+class ConfigLoader(Application):
+    """Loads the gunicorn config file the way `gunicorn -c gunicorn.conf.py` does, without serving."""
+    def init(self, parser, opts, args):
+        pass
+
+    def load_config(self):
+        self.load_config_from_file(CONFIG_PATH)
+
+    def load(self):
+        pass
+
+class TestGunicornConfig:
+    def test_config_file_loads(self, monkeypatch):
+        # The gevent worker would monkey patch the test process
+        monkeypatch.setenv("GUNICORN_WORKER_CLASS", "gthread")
+        cfg = ConfigLoader().cfg
+
+        assert cfg.preload_app is True
+        assert cfg.wsgi_app == "app:app"
+        assert cfg.workers == 1
+        assert cfg.worker_class_str == "gthread"
+        assert callable(cfg.post_fork)
@@ -0,0 +1,88 @@
+import os
+import sys
+import cProfile
+import pstats
+import pytest
+from flask import Flask, Blueprint, jsonify
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import profiling
+from api.profiling import ProfileStore
+
+TOKEN = "secret"
+
+def create_app(tmp_path, **settings):
+    app = Flask(__name__)
+    app.config["PROFILING_DIR"] = str(tmp_path)
+    app.config.update(settings)
+    profiling.init_app(app)
+
+    api = Blueprint("api", __name__)
+
+    @api.route("/graphql", methods=["GET", "POST"])
+    def graphql():
+        return jsonify({"data": sum(range(1000))})
+
+    app.register_blueprint(api)
+    return app
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    A fixture that sets up a Flask app profiling the GraphQL requests that carry a token.
+
+    return: The Flask app.
+    """
+    yield create_app(tmp_path, PROFILING_TOKEN=TOKEN, PROFILING_MAX_PER_MINUTE=2)
+
+class TestProfiling:
+    def test_disabled_without_trigger(self, tmp_path):
+        app = create_app(tmp_path)
+
+        assert "profiler" not in app.extensions
+        assert not app.before_request_funcs
+
+    def test_profile_saved_for_token(self, app, tmp_path):
+        response = app.test_client().post("/graphql", json={"query": "{ a }", "operationName": "Slow Query"}, headers={"X-Profile": TOKEN, "X-Request-ID": "abc"})
+
+        filename = response.headers["X-Profile-Id"]
+        assert filename.endswith("-abc-Slow_Query.pstats")
+        assert pstats.Stats(str(tmp_path / filename)).total_calls > 0
+
+    @pytest.mark.parametrize("headers", [
+        # TEST CASE 1 - No header
+        {},
+        # TEST CASE 2 - Wrong token
+        {"X-Profile": "guess"},
+    ])
+    def test_unprofiled_requests(self, app, tmp_path, headers):
+        response = app.test_client().post("/graphql", json={"query": "{ a }"}, headers=headers)
+
+        assert "X-Profile-Id" not in response.headers
+        assert os.listdir(tmp_path) == []
+
+    def test_profiles_per_minute(self, app, tmp_path):
+        client = app.test_client()
+        responses = [client.get("/graphql?query={a}", headers={"X-Profile": TOKEN}) for _ in range(3)]
+
+        assert ["X-Profile-Id" in response.headers for response in responses] == [True, True, False]
+
+    def test_sample_rate(self, tmp_path):
+        app = create_app(tmp_path, PROFILING_SAMPLE_RATE=1.0)
+
+        response = app.test_client().post("/graphql", json=[{"query": "{ a }"}])
+
+        assert response.headers["X-Profile-Id"].endswith("-batch.pstats")
+
+class TestProfileStore:
+    def test_prune_oldest(self, tmp_path):
+        store = ProfileStore(str(tmp_path), max_files=2)
+        for request_id in ["1", "2", "3"]:
+            filename = store.save(cProfile.Profile(), request_id, "op")
+            # Distinct modification times, oldest first
+            os.utime(tmp_path / filename, (int(request_id), int(request_id)))
+            store.prune()
+
+        assert sorted(name.split("-")[2] for name in os.listdir(tmp_path)) == ["2", "3"]
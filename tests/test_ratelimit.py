@@ -0,0 +1,143 @@
+import os
+import sys
+import threading
+import pytest
+from flask import Flask, Blueprint, jsonify
+from flask_jwt_extended import JWTManager
+from mongomock import MongoClient
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import ratelimit
+from api.ratelimit import Rate, MemoryBackend, MongoBackend, ConcurrencyLimiter, parse_rate, take_tokens, default_max_concurrency
+
+@pytest.fixture(params=["memory", "mongo"])
+def backend(request):
+    """
+    A fixture that sets up each token bucket backend, MongoDB being stood in by mongomock.
+
+    return: The backend.
+    """
+    if request.param == "memory":
+        yield MemoryBackend()
+    else:
+        yield MongoBackend(MongoClient().db.rate_limits)
+
+@pytest.fixture
+def app(backend):
+    """
+    A fixture that sets up a Flask app with tight limits on auth and GraphQL routes.
+
+    return: The Flask app.
+    """
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "test"
+    app.config["RATE_LIMITS"] = {"auth": Rate(2, 60), "read": Rate(3, 60), "mutation": Rate(1, 60)}
+    app.config["GRAPHQL_MAX_CONCURRENCY"] = 1
+    app.config["GRAPHQL_QUEUE_TIMEOUT"] = 0
+    JWTManager(app)
+    ratelimit.init_app(app, backend)
+
+    auth = Blueprint("auth", __name__)
+    api = Blueprint("api", __name__)
+
+    @auth.route("/login", methods=["POST"])
+    def login():
+        return jsonify({"msg": "ok"})
+
+    @api.route("/graphql", methods=["GET", "POST"])
+    def graphql():
+        return jsonify({"data": None})
+
+    app.register_blueprint(auth)
+    app.register_blueprint(api)
+    yield app
+
+class TestTokenBucket:
+    def test_parse_rate(self):
+        assert parse_rate("10/60") == Rate(10, 60.0)
+
+    @pytest.mark.parametrize("tokens, elapsed, expected", [
+        # TEST CASE 1 - Tokens left
+        (1, 0, (True, 0, 0)),
+        # TEST CASE 2 - Empty bucket, retry once a token refilled
+        (0, 0, (False, 0, 6.0)),
+        # TEST CASE 3 - Refilled over time, up to the capacity
+        (0, 1000, (True, 9, 0)),
+    ])
+    def test_take_tokens(self, tokens, elapsed, expected):
+        assert take_tokens(tokens, 0, elapsed, Rate(10, 60), 1) == expected
+
+    def test_backend_consume(self, backend):
+        rate = Rate(2, 60)
+
+        assert backend.consume("read:a", rate)[0]
+        assert backend.consume("read:a", rate)[0]
+        allowed, retry_after = backend.consume("read:a", rate)
+        assert not allowed and retry_after > 0
+        # Buckets are per key
+        assert backend.consume("read:b", rate)[0]
+
+class TestAdmissionControl:
+    def test_auth_budget(self, app):
+        client = app.test_client()
+
+        statuses = [client.post("/login").status_code for _ in range(3)]
+
+        assert statuses == [200, 200, 429]
+        assert int(client.post("/login").headers["Retry-After"]) >= 1
+
+    def test_mutations_have_their_own_budget(self, app):
+        client = app.test_client()
+        mutation = {"query": "mutation { deleteWorkout(workoutId: \"1\", userId: \"1\") { success } }"}
+
+        assert client.post("/graphql", json=mutation).status_code == 200
+        assert client.post("/graphql", json=mutation).status_code == 429
+        assert client.post("/graphql", json={"query": "{ allPoses { name } }"}).status_code == 200
+
+    def test_batch_costs_one_token_per_operation(self, app):
+        client = app.test_client()
+
+        assert client.post("/graphql", json=[{"query": "{ a }"}] * 3).status_code == 200
+        assert client.get("/graphql", query_string={"query": "{ a }"}).status_code == 429
+
+    def test_saturated_graphql_returns_503(self, app):
+        concurrency = app.extensions["graphql_concurrency"]
+        assert concurrency.acquire()
+        try:
+            response = app.test_client().post("/graphql", json={"query": "{ a }"})
+        finally:
+            concurrency.release()
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+    def test_slot_is_released_after_request(self, app):
+        client = app.test_client()
+        client.post("/graphql", json={"query": "{ a }"})
+
+        assert client.post("/graphql", json={"query": "{ a }"}).status_code == 200
+
+class TestConcurrencyLimiter:
+    @pytest.mark.parametrize("worker_connections, pool_size, reserved_connections, expected", [
+        # TEST CASE 1 - Bounded by the MongoDB pool
+        (1000, 100, 4, 96),
+        # TEST CASE 2 - Bounded by the worker connections
+        (50, 100, 4, 46),
+        # TEST CASE 3 - Never below a single execution
+        (2, 100, 4, 1),
+    ])
+    def test_default_max_concurrency(self, worker_connections, pool_size, reserved_connections, expected):
+        assert default_max_concurrency(worker_connections, pool_size, reserved_connections) == expected
+
+    def test_rejects_instead_of_queueing(self):
+        limiter = ConcurrencyLimiter(1)
+        assert limiter.acquire()
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(limiter.acquire()))
+        thread.start()
+        thread.join()
+
+        assert results == [False]
@@ -0,0 +1,95 @@
+import os
+import sys
+import pytest
+from flask import Flask
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import graphene
+from realtime import bus, sockets
+from realtime.events import publish_workout_change
+from workout.schema import Query, Subscription
+
+SUBSCRIPTION = """
+subscription WorkoutChanged($userId: String!) {
+    workoutChanged(userId: $userId) { kind workoutId workout { sets reps } }
+}
+"""
+
+@pytest.fixture
+def message_bus():
+    """
+    A fixture that sets up an in-process message bus for testing.
+
+    return: The message bus.
+    """
+    message_bus = bus.InProcessBus()
+    bus.set_bus(message_bus)
+    yield message_bus
+    bus.set_bus(None)
+
+@pytest.fixture
+def socket_client(message_bus):
+    """
+    A fixture that sets up a Socket.IO test client connected to an app serving the workout subscriptions.
+
+    return: The Socket.IO test client.
+    """
+    app = Flask(__name__)
+    sockets.init_app(app, graphene.Schema(query=Query, subscription=Subscription))
+    client = sockets.socketio.test_client(app)
+    yield client
+    client.disconnect()
+
+class TestMessageBus:
+    def test_publish_and_unsubscribe(self, message_bus):
+        received = []
+        unsubscribe = message_bus.subscribe("workouts:1", lambda channel, message: received.append(message))
+
+        message_bus.publish("workouts:1", {"n": 1})
+        message_bus.publish("workouts:2", {"n": 2})
+        unsubscribe()
+        message_bus.publish("workouts:1", {"n": 3})
+
+        assert received == [{"n": 1}]
+
+    def test_publish_failures_do_not_fail_the_write(self, message_bus):
+        def handler(channel, message):
+            raise ConnectionError("socket gone")
+        message_bus.subscribe("workouts:1", handler)
+
+        publish_workout_change("1", "created", "w1")
+
+    def test_unsupported_url(self):
+        with pytest.raises(ValueError):
+            bus.create_bus("amqp://localhost")
+
+class TestWorkoutSubscription:
+    def test_receives_changes_of_subscribed_user(self, socket_client):
+        socket_client.emit("subscribe", {"id": "1", "query": SUBSCRIPTION, "variables": {"userId": "user1"}})
+
+        publish_workout_change("user1", "created", "w1", {"_id": "w1", "sets": 3, "reps": 10})
+        publish_workout_change("user2", "created", "w2", {"_id": "w2", "sets": 1, "reps": 1})
+        publish_workout_change("user1", "deleted", "w1")
+
+        received = socket_client.get_received()
+        assert [message["name"] for message in received] == ["next", "next"]
+        assert received[0]["args"][0] == {"id": "1", "payload": {"data": {"workoutChanged": {"kind": "created", "workoutId": "w1", "workout": {"sets": 3, "reps": 10}}}}}
+        assert received[1]["args"][0]["payload"]["data"]["workoutChanged"] == {"kind": "deleted", "workoutId": "w1", "workout": None}
+
+    def test_complete_stops_delivery(self, socket_client, message_bus):
+        socket_client.emit("subscribe", {"id": "1", "query": SUBSCRIPTION, "variables": {"userId": "user1"}})
+        socket_client.emit("complete", {"id": "1"})
+
+        publish_workout_change("user1", "created", "w1", {"_id": "w1"})
+
+        assert socket_client.get_received() == []
+        assert message_bus._handlers == {}
+
+    def test_rejects_queries(self, socket_client):
+        socket_client.emit("subscribe", {"id": "1", "query": "{ __typename }"})
+
+        received = socket_client.get_received()
+        assert received[0]["name"] == "error"
+        assert received[0]["args"][0]["payload"] == {"errors": ["Operation must be a subscription"]}
@@ -0,0 +1,123 @@
+import os
+import sys
+import pytest
+from flask import Flask, jsonify
+from mongomock import MongoClient
+from pymongo.read_preferences import Primary
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workout.schema
+from database import routing
+from database.routing import RecentWrites, workload, routed, primary_reads, max_time_ms, make_read_preference
+from workout.schema import Query
+
+class ReplicaSetStandIn:
+    """
+    A replica set of two mongomock databases: writes go to the primary, reads go to the
+    primary or to a lagging secondary depending on the read preference of the collection.
+    """
+    def __init__(self):
+        self.primary = MongoClient().db
+        self.secondary = MongoClient().db
+        self.reads = []
+
+    def __getitem__(self, name):
+        return ReplicaSetCollection(self, name)
+
+class ReplicaSetCollection:
+    def __init__(self, replica_set, name, read_preference=Primary()):
+        self.replica_set = replica_set
+        self.name = name
+        self.read_preference = read_preference
+
+    def with_options(self, read_preference):
+        return ReplicaSetCollection(self.replica_set, self.name, read_preference)
+
+    def aggregate(self, pipeline, maxTimeMS=None):
+        self.replica_set.reads.append((self.read_preference.mongos_mode, maxTimeMS))
+        node = self.replica_set.primary if isinstance(self.read_preference, Primary) else self.replica_set.secondary
+        return node[self.name].aggregate(pipeline)
+
+@pytest.fixture
+def replica_set():
+    """
+    A fixture that sets up a replica set stand-in holding a done workout that the secondary has not replicated yet.
+
+    return: The replica set stand-in.
+    """
+    replica_set = ReplicaSetStandIn()
+    replica_set.primary["user_1"].insert_one({"exercise": {"_id": "e1", "name": "Squat"}, "sets": 3, "reps": 10, "weight": 100, "done": True})
+
+    previous_db, previous_writes = workout.schema.db_user_workouts, routing.recent_writes
+    workout.schema.db_user_workouts = replica_set
+    routing.recent_writes = RecentWrites(window=120)
+
+    yield replica_set
+
+    workout.schema.db_user_workouts, routing.recent_writes = previous_db, previous_writes
+
+class TestRouting:
+    def test_workload_is_scoped_to_the_resolver(self):
+        @workload(routing.ANALYTICS)
+        def resolver():
+            return max_time_ms()
+
+        assert resolver() == routing.WORKLOADS[routing.ANALYTICS].max_time_ms
+        assert max_time_ms() == routing.WORKLOADS[routing.TRANSACTIONAL].max_time_ms
+        assert resolver.workload == routing.ANALYTICS
+
+    def test_unknown_read_preference(self):
+        with pytest.raises(ValueError):
+            make_read_preference("secondaryOnly")
+
+    def test_analytics_read_from_secondary(self, replica_set):
+        result = Query().resolve_total_reps(None, "1")
+
+        assert result == []
+        assert replica_set.reads == [("secondaryPreferred", routing.WORKLOADS[routing.ANALYTICS].max_time_ms)]
+
+    def test_analytics_read_your_writes(self, replica_set):
+        routing.record_write("1")
+
+        result = Query().resolve_total_reps(None, "1")
+
+        assert [total.total_reps for total in result] == [30]
+        assert replica_set.reads[0][0] == "primary"
+
+    def test_other_users_are_not_pinned(self, replica_set):
+        routing.record_write("2")
+
+        Query().resolve_max_weight(None, "1")
+
+        assert replica_set.reads[0][0] == "secondaryPreferred"
+
+    def test_primary_reads_override_the_workload(self, replica_set):
+        with primary_reads():
+            result = Query().resolve_total_reps(None, "1")
+
+        assert [total.total_reps for total in result] == [30]
+        assert replica_set.reads[0][0] == "primary"
+
+    def test_read_your_writes_across_workers(self, replica_set):
+        app = Flask(__name__)
+        routing.init_app(app)
+
+        @app.route("/write", methods=["POST"])
+        def write():
+            routing.record_write("1")
+            return jsonify({})
+
+        client = app.test_client()
+        marker = client.post("/write").headers[routing.LAST_WRITE_HEADER]
+        # The read lands on another worker, which did not see the write
+        routing.recent_writes = RecentWrites(window=120)
+
+        with app.test_request_context(headers={routing.LAST_WRITE_HEADER: marker}):
+            Query().resolve_total_reps(None, "1")
+            Query().resolve_total_reps(None, "2")
+        with app.test_request_context(headers={"Cookie": f"{routing.LAST_WRITE_COOKIE}={marker}"}):
+            Query().resolve_total_reps(None, "1")
+
+        assert [read[0] for read in replica_set.reads] == ["primary", "secondaryPreferred", "primary"]
@@ -0,0 +1,81 @@
+import os
+import sys
+import gzip
+import json
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from flask import Flask, jsonify
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import serialization, compression
+
+@pytest.fixture(params=["stdlib", "orjson"])
+def app(request):
+    """
+    A fixture that sets up a Flask app serving a large JSON response with each JSON provider.
+
+    return: The Flask app.
+    """
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+
+    app = Flask(__name__)
+    app.config["JSON_SERIALIZER"] = request.param
+    app.config["COMPRESSION_MIN_SIZE"] = 100
+    serialization.init_app(app)
+    compression.init_app(app)
+
+    @app.route("/data")
+    def data():
+        return jsonify({"data": [{"_id": ObjectId("64a0b1c2d3e4f5a6b7c8d9e0"), "date": datetime(2023, 7, 1, 12, 30)}] * 20})
+
+    @app.route("/small")
+    def small():
+        return jsonify({"data": None})
+
+    yield app
+
+class TestSerialization:
+    def test_serializes_objectid_and_datetime(self, app):
+        response = app.test_client().get("/data")
+
+        assert response.status_code == 200
+        assert response.json["data"][0] == {"_id": "64a0b1c2d3e4f5a6b7c8d9e0", "date": "2023-07-01T12:30:00"}
+
+    def test_unknown_serializer(self):
+        with pytest.raises(ValueError):
+            serialization.get_json_provider_class("unknown")
+
+class TestCompression:
+    @pytest.mark.parametrize("accept_encoding, expected_encoding", [
+        # TEST CASE 1 - Client does not accept compression
+        ("", None),
+        # TEST CASE 2 - Client accepts gzip only
+        ("gzip", "gzip"),
+        # TEST CASE 3 - Server prefers brotli when both are accepted
+        ("gzip, br", "br"),
+        # TEST CASE 4 - Client quality values win over server preference
+        ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ])
+    def test_negotiates_encoding(self, app, accept_encoding, expected_encoding):
+        if expected_encoding == "br":
+            pytest.importorskip("brotli")
+
+        response = app.test_client().get("/data", headers={"Accept-Encoding": accept_encoding})
+
+        assert response.headers.get("Content-Encoding") == expected_encoding
+        assert "Accept-Encoding" in response.headers["Vary"]
+
+    def test_gzip_round_trip(self, app):
+        response = app.test_client().get("/data", headers={"Accept-Encoding": "gzip"})
+
+        assert len(json.loads(gzip.decompress(response.data))["data"]) == 20
+
+    def test_skips_small_responses(self, app):
+        response = app.test_client().get("/small", headers={"Accept-Encoding": "gzip"})
+
+        assert "Content-Encoding" not in response.headers
+        assert response.json == {"data": None}
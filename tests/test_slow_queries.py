@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+from types import SimpleNamespace
+import pytest
+from bson import ObjectId
+from mongomock import MongoClient
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.slow_queries import SlowQueryListener, Explainer, strip_literals, command_shape, summarize_plan, explain_command
+from database.index_advisor import suggest_index, report
+
+COLLSCAN_EXPLAIN = {
+    "queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}},
+    "executionStats": {"nReturned": 2, "totalKeysExamined": 0, "totalDocsExamined": 500}
+}
+PIPELINE = [
+    {"$match": {"date": {"$gte": "2023-07-01", "$lte": "2023-07-31"}}},
+    {"$match": {"exercise._id": ObjectId()}},
+    {"$match": {"done": True}},
+    {"$group": {"_id": "$exercise", "total_reps": {"$sum": {"$multiply": ["$sets", "$reps"]}}}},
+    {"$sort": {"total_reps": -1}}
+]
+
+class ExplainStandIn:
+    """
+    A MongoClient whose databases answer explain commands with a canned plan, and
+    store everything else in mongomock.
+    """
+    def __init__(self, explain):
+        self.mongo = MongoClient()
+        self.explain = explain
+        self.explained = []
+
+    def __getitem__(self, name):
+        return ExplainDatabase(self, name)
+
+class ExplainDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def command(self, command):
+        self.client.explained.append(command)
+        return self.client.explain
+
+    def __getitem__(self, name):
+        return self.client.mongo[self.name][name]
+
+class ExplainerStandIn:
+    def __init__(self):
+        self.captures = []
+
+    def submit(self, capture):
+        self.captures.append(capture)
+
+def command_events(command_name, command, duration_ms, request_id=1, database_name="user_workouts"):
+    started = SimpleNamespace(command_name=command_name, command=command, database_name=database_name, connection_id=("localhost", 27017), request_id=request_id)
+    succeeded = SimpleNamespace(command_name=command_name, connection_id=("localhost", 27017), request_id=request_id, duration_micros=int(duration_ms * 1000))
+    return started, succeeded
+
+class TestShapes:
+    @pytest.mark.parametrize("value, expected_shape", [
+        # TEST CASE 1 - Equality and range literals
+        ({"user_id": ObjectId(), "date": {"$gte": "2023-07-01"}}, {"user_id": "?", "date": {"$gte": "?"}}),
+        # TEST CASE 2 - Lists of literals
+        ({"muscles": {"$in": ["legs", "back", "chest"]}}, {"muscles": {"$in": ["?"]}}),
+        # TEST CASE 3 - Pipeline keeps field paths and sort directions
+        (PIPELINE, [
+            {"$match": {"date": {"$gte": "?", "$lte": "?"}}},
+            {"$match": {"exercise._id": "?"}},
+            {"$match": {"done": "?"}},
+            {"$group": {"_id": "$exercise", "total_reps": {"$sum": {"$multiply": ["$sets", "$reps"]}}}},
+            {"$sort": {"total_reps": -1}}
+        ]),
+    ])
+    def test_strip_literals(self, value, expected_shape):
+        assert strip_literals(value) == expected_shape
+
+    def test_command_shape(self):
+        command = {"find": "user_1", "filter": {"done": False}, "sort": {"date": -1}, "limit": 12, "lsid": {"id": 1}}
+
+        assert command_shape("find", command) == {"filter": {"done": "?"}, "sort": {"date": -1}}
+        assert command_shape("distinct", {"distinct": "exercises", "key": "muscles"}) == {"key": "muscles"}
+
+    def test_explain_command(self):
+        command = {"aggregate": "user_1", "pipeline": [], "cursor": {"batchSize": 10}, "$db": "user_workouts", "lsid": {"id": 1}}
+
+        assert explain_command("aggregate", command) == {"aggregate": "user_1", "pipeline": [], "cursor": {}}
+
+    @pytest.mark.parametrize("explain, expected_plan", [
+        # TEST CASE 1 - Collection scan
+        (COLLSCAN_EXPLAIN, {"collscan": True, "indexes": [], "stages": ["SORT", "COLLSCAN"], "keys_examined": 0, "docs_examined": 500, "returned": 2}),
+        # TEST CASE 2 - Index scan nested in a pipeline explain
+        ({"stages": [{"$cursor": {
+            "queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "date_1"}}},
+            "executionStats": {"nReturned": 5, "totalKeysExamined": 5, "totalDocsExamined": 5}
+        }}]}, {"collscan": False, "indexes": ["date_1"], "stages": ["FETCH", "IXSCAN"], "keys_examined": 5, "docs_examined": 5, "returned": 5}),
+    ])
+    def test_summarize_plan(self, explain, expected_plan):
+        assert summarize_plan(explain) == expected_plan
+
+class TestSlowQueryListener:
+    def test_captures_slow_reads(self):
+        explainer = ExplainerStandIn()
+        listener = SlowQueryListener(100, explainer)
+
+        for request_id, (command_name, command, duration_ms) in enumerate([
+            ("find", {"find": "user_64a0b1c2d3e4f5a6b7c8d9e0", "filter": {"done": False}}, 150),
+            ("find", {"find": "user_64a0b1c2d3e4f5a6b7c8d9e1", "filter": {"done": True}}, 250),
+            ("find", {"find": "exercises", "filter": {}}, 5),
+            ("insert", {"insert": "exercises", "documents": []}, 500),
+        ]):
+            started, succeeded = command_events(command_name, command, duration_ms, request_id)
+            listener.started(started)
+            listener.succeeded(succeeded)
+
+        assert [capture["duration_ms"] for capture in explainer.captures] == [150, 250]
+        # Both users' collections have the same shape
+        assert {capture["namespace"] for capture in explainer.captures} == {"user_workouts.user_*"}
+        assert len({capture["shape_id"] for capture in explainer.captures}) == 1
+        assert listener._started == {}
+
+    def test_explainer_records_plan_once_per_interval(self):
+        client = ExplainStandIn(COLLSCAN_EXPLAIN)
+        explainer = Explainer(lambda: client, interval=300)
+        listener = SlowQueryListener(100, ExplainerStandIn())
+
+        for request_id in range(2):
+            started, succeeded = command_events("aggregate", {"aggregate": "user_1", "pipeline": PIPELINE, "cursor": {}}, 200, request_id)
+            listener.started(started)
+            listener.succeeded(succeeded)
+        for capture in listener.explainer.captures:
+            explainer.process(capture)
+
+        assert len(client.explained) == 1
+        assert client.explained[0]["verbosity"] == "executionStats"
+        record = client.mongo.workouttracker.slow_queries.find_one()
+        assert (record["count"], record["total_ms"], record["max_ms"]) == (2, 400, 200)
+        assert record["plan"]["collscan"] is True
+        assert json.loads(record["shape"])["pipeline"][2] == {"$match": {"done": "?"}}
+
+class TestIndexAdvisor:
+    @pytest.mark.parametrize("command, shape, expected_keys", [
+        # TEST CASE 1 - Equality, then sort, then range
+        ("find", {"filter": {"date": {"$gte": "?"}, "done": "?"}, "sort": {"date": -1}}, [("done", 1), ("date", -1)]),
+        # TEST CASE 2 - Leading $match stages of a pipeline
+        ("aggregate", {"pipeline": strip_literals(PIPELINE)}, [("exercise._id", 1), ("done", 1), ("date", 1)]),
+        # TEST CASE 3 - $in is an equality, $and is flattened
+        ("count", {"query": {"$and": [{"muscles": "?"}, {"user_id": {"$in": ["?"]}}]}}, [("muscles", 1), ("user_id", 1)]),
+        # TEST CASE 4 - Nothing to index
+        ("find", {"filter": {}}, None),
+    ])
+    def test_suggest_index(self, command, shape, expected_keys):
+        assert suggest_index(command, shape) == expected_keys
+
+    def test_report(self):
+        slow_queries = MongoClient().db.slow_queries
+        indexed_plan = {"collscan": False, "indexes": ["done_1"], "stages": ["FETCH", "IXSCAN"], "keys_examined": 5, "docs_examined": 5, "returned": 5}
+        slow_queries.insert_many([
+            {"namespace": "user_workouts.user_*", "command": "find", "shape": json.dumps({"filter": {"done": "?"}}), "count": 3, "total_ms": 600, "plan": summarize_plan(COLLSCAN_EXPLAIN)},
+            {"namespace": "user_workouts.user_*", "command": "count", "shape": json.dumps({"query": {"done": "?"}}), "count": 1, "total_ms": 150},
+            {"namespace": "workouttracker.exercises", "command": "find", "shape": json.dumps({"filter": {"name": "?"}}), "count": 9, "total_ms": 900, "plan": indexed_plan},
+        ])
+
+        suggestions = report(slow_queries)
+
+        assert [(suggestion["namespace"], suggestion["keys"]) for suggestion in suggestions] == [("user_workouts.user_*", [("done", 1)])]
+        assert (suggestions[0]["count"], suggestions[0]["collscans"], suggestions[0]["shapes"]) == (4, 3, 2)
@@ -0,0 +1,184 @@
+import os
+import sys
+import pytest
+from mongomock import MongoClient
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stats.schema
+from stats.jobs import StatsAggregator, percentile, week_of
+from workout.sync import stamp_write, record_deletion, backfill_seq
+from stats.runner import Lease, JobRunner
+from stats.schema import Query
+
+SQUAT = {"_id": "e1", "name": "Squat"}
+ROW = {"_id": "e2", "name": "Row"}
+
+def workout(exercise, date, weight, done=True):
+    return {"exercise": exercise, "sets": 3, "reps": 10, "weight": weight, "duration": None, "date": date, "done": done}
+
+@pytest.fixture
+def databases():
+    """
+    A fixture that sets up mock workouts and stats databases with two users.
+
+    return: The workouts and stats databases.
+    """
+    client = MongoClient()
+    workouts_db = client.user_workouts
+    stats_db = client.workouttracker
+    workouts_db["user_1"].insert_many([
+        workout(SQUAT, "2023-07-03", 100),
+        workout(SQUAT, "2023-07-05", 120),
+        workout(ROW, "2023-07-04", 60, done=False),
+    ])
+    workouts_db["user_2"].insert_many([
+        workout(SQUAT, "2023-07-06", 80),
+    ])
+    # Other collections of the database are not workouts
+    workouts_db["templates_1"].insert_one({"name": "not a workout"})
+    # Sequenced as `python -m workout.sync backfill` does after deploying
+    backfill_seq(workouts_db, "1")
+    backfill_seq(workouts_db, "2")
+
+    yield workouts_db, stats_db
+
+@pytest.fixture
+def aggregator(databases):
+    """
+    A fixture that sets up a stats aggregator reading two workouts per batch.
+
+    return: The stats aggregator.
+    """
+    workouts_db, stats_db = databases
+    yield StatsAggregator(workouts_db, stats_db, batch_size=2)
+
+class TestStatsAggregator:
+    def test_week_of(self):
+        assert week_of("2023-07-05") == ("2023-W27", "2023-07-03", "2023-07-09")
+
+    @pytest.mark.parametrize("values, fraction, expected", [
+        # TEST CASE 1 - Median of an odd number of values
+        ([3, 1, 2], 0.5, 2),
+        # TEST CASE 2 - High percentile
+        (list(range(1, 11)), 0.9, 9),
+        # TEST CASE 3 - No values
+        ([], 0.5, None),
+    ])
+    def test_percentile(self, values, fraction, expected):
+        assert percentile(values, fraction) == expected
+
+    def test_run_builds_summaries(self, aggregator):
+        assert aggregator.run() == 4
+
+        # Planned workouts that are not done are not counted
+        popularity = {doc["_id"]: doc["count"] for doc in aggregator.popularity.find()}
+        assert popularity == {"2023-W27:e1": 3}
+
+        squat = aggregator.benchmarks.find_one({"_id": "e1"})
+        assert squat["users"] == 2
+        assert squat["median_max_weight"] == 80
+        assert squat["p90_max_weight"] == 120
+        # Workouts that are not done do not count as a max
+        assert aggregator.benchmarks.find_one({"_id": "e2"}) is None
+
+    def test_run_is_incremental_and_idempotent(self, aggregator, databases):
+        workouts_db, _ = databases
+        aggregator.run()
+
+        assert aggregator.run() == 0
+
+        # A crash before the checkpoint was saved processes the batch again
+        aggregator.checkpoints.update_many({}, {"$unset": {"stats_seq": ""}})
+        with stamp_write(workouts_db, "2") as stamp:
+            workouts_db["user_2"].insert_one({**workout(SQUAT, "2023-07-07", 90), **stamp})
+        assert aggregator.run() == 5
+
+        assert aggregator.popularity.find_one({"_id": "2023-W27:e1"})["count"] == 4
+        assert aggregator.benchmarks.find_one({"_id": "e1"})["median_max_weight"] == 90
+
+    def test_updates_are_aggregated(self, aggregator, databases):
+        workouts_db, _ = databases
+        aggregator.run()
+        row = workouts_db["user_1"].find_one({"exercise._id": "e2"})
+
+        # A planned workout marked done with a weight
+        with stamp_write(workouts_db, "1") as stamp:
+            workouts_db["user_1"].update_one({"_id": row["_id"]}, {"$set": {"done": True, "weight": 70, **stamp}})
+
+        assert aggregator.run() == 1
+        assert aggregator.popularity.find_one({"_id": "2023-W27:e2"})["count"] == 1
+        assert aggregator.benchmarks.find_one({"_id": "e2"})["median_max_weight"] == 70
+
+    def test_only_written_users_are_visited(self, aggregator, databases, monkeypatch):
+        workouts_db, _ = databases
+        aggregator.run()
+        visited = []
+        aggregate_user = aggregator.aggregate_user
+        monkeypatch.setattr(aggregator, "aggregate_user", lambda user_id, since=0: visited.append((user_id, since)) or aggregate_user(user_id, since))
+
+        assert aggregator.run() == 0
+        assert visited == []
+
+        with stamp_write(workouts_db, "2") as stamp:
+            workouts_db["user_2"].insert_one({**workout(SQUAT, "2023-07-07", 90), **stamp})
+
+        assert aggregator.run() == 1
+        assert visited == [("2", 1)]
+
+    def test_benchmark_without_users_is_deleted(self, aggregator, databases):
+        workouts_db, _ = databases
+        row = workouts_db["user_1"].find_one({"exercise._id": "e2"})
+        with stamp_write(workouts_db, "1") as stamp:
+            workouts_db["user_1"].update_one({"_id": row["_id"]}, {"$set": {"done": True, "weight": 70, **stamp}})
+        aggregator.run()
+        assert aggregator.benchmarks.find_one({"_id": "e2"})["users"] == 1
+
+        workouts_db["user_1"].delete_one({"_id": row["_id"]})
+        record_deletion(workouts_db, "1", row["_id"])
+        aggregator.run()
+
+        assert aggregator.benchmarks.find_one({"_id": "e2"}) is None
+
+    def test_moves_and_deletes_are_aggregated(self, aggregator, databases):
+        workouts_db, _ = databases
+        aggregator.run()
+        heaviest = workouts_db["user_1"].find_one({"weight": 120})
+        lightest = workouts_db["user_1"].find_one({"weight": 100})
+
+        # Moved to the next week, then the heaviest one deleted
+        with stamp_write(workouts_db, "1") as stamp:
+            workouts_db["user_1"].update_one({"_id": lightest["_id"]}, {"$set": {"date": "2023-07-10", **stamp}})
+        workouts_db["user_1"].delete_one({"_id": heaviest["_id"]})
+        record_deletion(workouts_db, "1", heaviest["_id"])
+
+        assert aggregator.run() == 2
+        popularity = {doc["_id"]: doc["count"] for doc in aggregator.popularity.find()}
+        assert popularity == {"2023-W27:e1": 1, "2023-W28:e1": 1}
+        assert aggregator.user_max.find_one({"_id": "1:e1"})["max_weight"] == 100
+
+    def test_resolvers_read_summaries(self, aggregator, monkeypatch):
+        aggregator.run()
+        monkeypatch.setattr(stats.schema, "popularity_collection", aggregator.popularity)
+        monkeypatch.setattr(stats.schema, "benchmarks_collection", aggregator.benchmarks)
+
+        popular = Query().resolve_popular_exercises(None, week="2023-W27")
+        benchmark = Query().resolve_exercise_benchmarks(None, "e1")
+
+        assert [(doc.exercise["name"], doc.count) for doc in popular] == [("Squat", 3)]
+        assert benchmark.users == 2
+        assert Query().resolve_exercise_benchmarks(None, "unknown") is None
+
+class TestJobRunner:
+    def test_lease_is_held_by_a_single_runner(self):
+        collection = MongoClient().db.leases
+        first = JobRunner(lambda: "first", 60, Lease(collection, "stats", ttl=600))
+        second = JobRunner(lambda: "second", 60, Lease(collection, "stats", ttl=600))
+
+        assert first.run_once() == "first"
+        assert second.run_once() is None
+        assert first.run_once() == "first"
+
+        first.stop()
+        assert second.run_once() == "second"
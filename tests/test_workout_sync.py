@@ -0,0 +1,151 @@
+import os
+import sys
+import pytest
+from bson import ObjectId
+from mongomock import MongoClient
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workout.schema
+import workout.sync
+from workout.schema import Query, CreateWorkout, UpdateWorkout, DeleteWorkout
+from datetime import datetime, timedelta, timezone
+from workout.sync import changes_since, next_seq, stamp_write, backfill_seq, COUNTERS_COLLECTION
+
+USER_ID = "64a0b1c2d3e4f5a6b7c8d9e0"
+EXERCISE_ID = "64a0b1c2d3e4f5a6b7c8d9e1"
+
+@pytest.fixture
+def mock_db_user_workouts(monkeypatch):
+    """
+    A fixture that sets up mock user workouts and exercises collections for testing.
+
+    return: The mock user workouts database.
+    """
+    mock_client = MongoClient()
+    mock_client.db.exercises.insert_one({"_id": ObjectId(EXERCISE_ID), "name": "Squat"})
+
+    monkeypatch.setattr(workout.schema, "db_user_workouts", mock_client.user_workouts)
+    monkeypatch.setattr(workout.schema, "exercises_collection", mock_client.db.exercises)
+    monkeypatch.setattr(workout.schema, "publish_workout_change", lambda *args, **kwargs: None)
+    monkeypatch.setattr(workout.sync, "_indexed_users", set())
+    monkeypatch.setattr(workout.sync, "_seen_seqs", {})
+
+    yield mock_client.user_workouts
+
+def create_workout(date="2023-07-03"):
+    return CreateWorkout().mutate(None, EXERCISE_ID, 3, 10, date, False, USER_ID).workout
+
+class TestWorkoutChanges:
+    def test_seq_is_per_user(self, mock_db_user_workouts):
+        assert [next_seq(mock_db_user_workouts, USER_ID) for _ in range(3)] == [1, 2, 3]
+        assert next_seq(mock_db_user_workouts, "other") == 1
+
+    def test_writes_are_stamped(self, mock_db_user_workouts):
+        created = create_workout()
+        updated = UpdateWorkout().mutate(None, str(created._id), EXERCISE_ID, USER_ID, done=True).workout
+
+        assert created.seq == 1 and created.updated_at
+        assert updated.seq == 2 and updated.done is True
+
+    def test_changes_since_cursor(self, mock_db_user_workouts):
+        first = create_workout()
+        second = create_workout()
+        page = Query().resolve_workout_changes(None, USER_ID)
+        
+        assert [change.workout_id for change in page.changes] == [str(first._id), str(second._id)]
+        assert (page.cursor, page.has_more) == (2, False)
+
+        UpdateWorkout().mutate(None, str(first._id), EXERCISE_ID, USER_ID, reps=12)
+        DeleteWorkout().mutate(None, str(second._id), USER_ID)
+        page = Query().resolve_workout_changes(None, USER_ID, since=page.cursor)
+
+        assert [(change.kind, change.workout_id) for change in page.changes] == [("upsert", str(first._id)), ("delete", str(second._id))]
+        assert page.changes[0].workout.reps == 12
+        assert page.changes[1].workout is None
+        assert page.cursor == 4
+
+        page = Query().resolve_workout_changes(None, USER_ID, since=page.cursor)
+        assert (page.changes, page.cursor, page.has_more) == ([], 4, False)
+
+    @pytest.mark.parametrize("limit, expected_pages", [
+        # TEST CASE 1 - Pages smaller than the changes
+        (2, [[3, 4], [5]]),
+        # TEST CASE 2 - A single page
+        (5, [[3, 4, 5]]),
+    ])
+    def test_paging_merges_deletions(self, mock_db_user_workouts, limit, expected_pages):
+        # Only the latest change of each workout is returned
+        workouts = [create_workout() for _ in range(3)]
+        DeleteWorkout().mutate(None, str(workouts[0]._id), USER_ID)
+        UpdateWorkout().mutate(None, str(workouts[1]._id), EXERCISE_ID, USER_ID, done=True)
+
+        pages, since, has_more = [], 0, True
+        while has_more:
+            changes, since, has_more = changes_since(mock_db_user_workouts, USER_ID, since, limit)
+            pages.append([doc["seq"] for kind, doc in changes])
+
+        assert pages == expected_pages
+
+    def test_interleaved_writes_are_not_skipped(self, mock_db_user_workouts):
+        user_collection = mock_db_user_workouts[f"user_{USER_ID}"]
+        first = create_workout()
+
+        # A slow write allocates its seq, then a faster write commits a higher seq
+        with stamp_write(mock_db_user_workouts, USER_ID) as slow_stamp:
+            fast = create_workout()
+            changes, cursor, has_more = changes_since(mock_db_user_workouts, USER_ID, 0)
+
+            assert slow_stamp["seq"] == 2 and fast.seq == 3
+            assert [doc["seq"] for kind, doc in changes] == [1]
+            assert cursor == 1
+
+            user_collection.insert_one({"date": "2023-07-04", "done": False, **slow_stamp})
+
+        changes, cursor, has_more = changes_since(mock_db_user_workouts, USER_ID, cursor)
+        assert [doc["seq"] for kind, doc in changes] == [2, 3]
+        assert cursor == 3
+
+    def test_dead_pending_writes_time_out(self, mock_db_user_workouts):
+        create_workout()
+        mock_db_user_workouts[COUNTERS_COLLECTION].update_one({"_id": USER_ID}, {"$push": {"pending": {
+            "_id": ObjectId(),
+            "floor": 0,
+            "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)
+        }}})
+
+        changes, cursor, has_more = changes_since(mock_db_user_workouts, USER_ID)
+        assert cursor == 1
+
+        # The next write drops it
+        create_workout()
+        assert mock_db_user_workouts[COUNTERS_COLLECTION].find_one({"_id": USER_ID})["pending"] == []
+
+    def test_history_is_backfilled_in_batches(self, mock_db_user_workouts):
+        user_collection = mock_db_user_workouts[f"user_{USER_ID}"]
+        user_collection.insert_many([{"date": f"2023-01-0{day}", "done": True} for day in range(1, 6)])
+        create_workout()
+
+        # Not returned until backfilled
+        changes, cursor, has_more = changes_since(mock_db_user_workouts, USER_ID)
+        assert [doc.get("date") for kind, doc in changes] == ["2023-07-03"]
+
+        assert backfill_seq(mock_db_user_workouts, USER_ID, batch_size=2) == 5
+
+        changes, cursor, has_more = changes_since(mock_db_user_workouts, USER_ID, cursor)
+        assert [doc.get("date") for kind, doc in changes] == [f"2023-01-0{day}" for day in range(1, 6)]
+        assert [doc["seq"] for kind, doc in changes] == [2, 3, 4, 5, 6]
+        assert user_collection.count_documents({"seq": None}) == 0
+        assert mock_db_user_workouts[COUNTERS_COLLECTION].find_one({"_id": USER_ID})["pending"] == []
+
+    def test_backfill_command(self, mock_db_user_workouts, monkeypatch):
+        mock_db_user_workouts[f"user_{USER_ID}"].insert_one({"date": "2023-01-01", "done": True})
+        mock_db_user_workouts["user_other"].insert_one({"date": "2023-01-01", "done": True})
+        monkeypatch.setattr(workout.sync, "LazyDatabase", lambda name: mock_db_user_workouts)
+        monkeypatch.setattr(sys, "argv", ["sync", "backfill"])
+
+        workout.sync.main()
+
+        assert mock_db_user_workouts[f"user_{USER_ID}"].find_one()["seq"] == 1
+        assert mock_db_user_workouts["user_other"].find_one()["seq"] == 1
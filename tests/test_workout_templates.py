@@ -0,0 +1,161 @@
+import os
+import sys
+import pytest
+from bson import ObjectId
+from mongomock import MongoClient
+from pymongo.errors import DuplicateKeyError
+
+# Add the project's root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workout.schema
+import workout.templates
+from workout.schema import Query, CreateWorkoutTemplate, UpdateWorkoutOccurrence, DeleteWorkoutOccurrence, DeleteWorkout, UpdateWorkout
+from workout.templates import occurrence_dates, expand_templates
+
+USER_ID = "64a0b1c2d3e4f5a6b7c8d9e0"
+EXERCISE_ID = "64a0b1c2d3e4f5a6b7c8d9e1"
+
+@pytest.fixture
+def mock_db_user_workouts(monkeypatch):
+    """
+    A fixture that sets up mock user workouts and exercises collections for testing.
+
+    return: The mock user workouts database.
+    """
+    mock_client = MongoClient()
+    mock_client.db.exercises.insert_one({"_id": ObjectId(EXERCISE_ID), "name": "Squat"})
+
+    monkeypatch.setattr(workout.schema, "db_user_workouts", mock_client.user_workouts)
+    monkeypatch.setattr(workout.schema, "exercises_collection", mock_client.db.exercises)
+    monkeypatch.setattr(workout.schema, "publish_workout_change", lambda *args, **kwargs: None)
+    monkeypatch.setattr(workout.templates, "_indexed_users", set())
+
+    yield mock_client.user_workouts
+
+def create_template(recurrence="FREQ=WEEKLY;BYDAY=MO,WE", start_date="2023-07-03", end_date=None):
+    result = CreateWorkoutTemplate().mutate(None, EXERCISE_ID, 3, 10, recurrence, start_date, USER_ID, weight=100, end_date=end_date)
+    return result.template
+
+class TestOccurrences:
+    @pytest.mark.parametrize("template, date_gte, date_lte, expected_dates", [
+        # TEST CASE 1 - Weekly on two days
+        ({"recurrence": "FREQ=WEEKLY;BYDAY=MO,WE", "start_date": "2023-07-03"}, "2023-07-03", "2023-07-12", ["2023-07-03", "2023-07-05", "2023-07-10", "2023-07-12"]),
+        # TEST CASE 2 - Range before the template starts
+        ({"recurrence": "FREQ=DAILY", "start_date": "2023-07-03"}, "2023-06-01", "2023-06-30", []),
+        # TEST CASE 3 - Template ending within the range
+        ({"recurrence": "FREQ=DAILY", "start_date": "2023-07-03", "end_date": "2023-07-04"}, "2023-07-01", "2023-07-10", ["2023-07-03", "2023-07-04"]),
+        # TEST CASE 4 - Skipped occurrences
+        ({"recurrence": "FREQ=DAILY", "start_date": "2023-07-03", "exdates": ["2023-07-04"]}, "2023-07-03", "2023-07-05", ["2023-07-03", "2023-07-05"]),
+    ])
+    def test_occurrence_dates(self, template, date_gte, date_lte, expected_dates):
+        assert occurrence_dates(template, date_gte, date_lte) == expected_dates
+
+class TestWorkoutTemplates:
+    def test_invalid_recurrence(self, mock_db_user_workouts):
+        with pytest.raises(ValueError):
+            create_template(recurrence="FREQ=SOMETIMES")
+
+    def test_template_stores_no_workouts(self, mock_db_user_workouts):
+        create_template()
+
+        assert mock_db_user_workouts[f"user_{USER_ID}"].count_documents({}) == 0
+
+    def test_occurrences_are_expanded_until_written(self, mock_db_user_workouts):
+        template = create_template()
+        templates_collection = mock_db_user_workouts[f"templates_{USER_ID}"]
+        user_collection = mock_db_user_workouts[f"user_{USER_ID}"]
+
+        UpdateWorkoutOccurrence().mutate(None, str(template._id), "2023-07-03", USER_ID, done=True)
+        UpdateWorkoutOccurrence().mutate(None, str(template._id), "2023-07-05", USER_ID, reps=12)
+        DeleteWorkoutOccurrence().mutate(None, str(template._id), "2023-07-10", USER_ID)
+
+        pending = expand_templates(templates_collection, user_collection, "2023-07-03", "2023-07-12")
+        assert [workout["date"] for workout in pending] == ["2023-07-12"]
+
+        written = {workout["date"]: workout for workout in user_collection.find()}
+        assert written["2023-07-03"]["done"] is True
+        assert written["2023-07-05"]["reps"] == 12
+        assert written["2023-07-05"]["weight"] == 100
+        assert written["2023-07-05"]["done"] is False
+
+    def test_occurrence_is_written_once(self, mock_db_user_workouts):
+        template = create_template()
+
+        UpdateWorkoutOccurrence().mutate(None, str(template._id), "2023-07-03", USER_ID, reps=12)
+        result = UpdateWorkoutOccurrence().mutate(None, str(template._id), "2023-07-03", USER_ID, done=True)
+
+        assert mock_db_user_workouts[f"user_{USER_ID}"].count_documents({}) == 1
+        assert (result.workout.reps, result.workout.done) == (12, True)
+
+    def test_concurrent_insert_of_an_occurrence_is_retried(self, mock_db_user_workouts, monkeypatch):
+        template = create_template()
+        user_collection = mock_db_user_workouts[f"user_{USER_ID}"]
+        update_one = user_collection.update_one
+        calls = []
+
+        # Another request inserts the occurrence between the match and the insert of the upsert
+        def racing_update_one(filter, update, upsert=False):
+            calls.append(filter)
+            if len(calls) == 1:
+                user_collection.insert_one({**filter, "reps": 12})
+                raise DuplicateKeyError("E11000 duplicate key error")
+            return update_one(filter, update, upsert=upsert)
+
+        monkeypatch.setattr(user_collection, "update_one", racing_update_one)
+
+        result = UpdateWorkoutOccurrence().mutate(None, str(template._id), "2023-07-03", USER_ID, done=True)
+
+        assert len(calls) == 2
+        assert user_collection.count_documents({}) == 1
+        assert (result.workout.reps, result.workout.done) == (12, True)
+
+    def test_occurrence_index_is_unique(self, mock_db_user_workouts):
+        template = create_template()
+        user_collection = mock_db_user_workouts[f"user_{USER_ID}"]
+        UpdateWorkoutOccurrence().mutate(None, str(template._id), "2023-07-03", USER_ID, done=True)
+
+        with pytest.raises(DuplicateKeyError):
+            user_collection.insert_one({"template_id": str(template._id), "occurrence_date": "2023-07-03"})
+        # Workouts not created from a template are not indexed
+        user_collection.insert_many([{"date": "2023-07-03"}, {"date": "2023-07-03"}])
+
+    def test_moved_occurrence_is_not_expanded_again(self, mock_db_user_workouts):
+        template = create_template()
+        written = UpdateWorkoutOccurrence().mutate(None, str(template._id), "2023-07-03", USER_ID, reps=12).workout
+
+        UpdateWorkout().mutate(None, str(written._id), EXERCISE_ID, USER_ID, date="2023-07-04")
+
+        pending = expand_templates(mock_db_user_workouts[f"templates_{USER_ID}"], mock_db_user_workouts[f"user_{USER_ID}"], "2023-07-03", "2023-07-05")
+        assert [workout["date"] for workout in pending] == ["2023-07-05"]
+
+        # Updating the occurrence again updates the moved workout
+        result = UpdateWorkoutOccurrence().mutate(None, str(template._id), "2023-07-03", USER_ID, done=True)
+        assert (str(result.workout._id), result.workout.date) == (str(written._id), "2023-07-04")
+
+        # Deleting the moved workout skips the date it occurred on
+        DeleteWorkout().mutate(None, str(written._id), USER_ID)
+        assert "2023-07-03" in mock_db_user_workouts[f"templates_{USER_ID}"].find_one()["exdates"]
+
+    def test_deleting_a_written_occurrence_skips_it(self, mock_db_user_workouts):
+        template = create_template(recurrence="FREQ=DAILY", start_date="2023-07-03")
+        written = UpdateWorkoutOccurrence().mutate(None, str(template._id), "2023-07-04", USER_ID, reps=12).workout
+
+        assert DeleteWorkout().mutate(None, str(written._id), USER_ID).success
+
+        pending = expand_templates(mock_db_user_workouts[f"templates_{USER_ID}"], mock_db_user_workouts[f"user_{USER_ID}"], "2023-07-03", "2023-07-05")
+        assert [workout["date"] for workout in pending] == ["2023-07-03", "2023-07-05"]
+
+    def test_update_rejects_dates_without_occurrence(self, mock_db_user_workouts):
+        template = create_template()
+
+        with pytest.raises(ValueError):
+            UpdateWorkoutOccurrence().mutate(None, str(template._id), "2023-07-04", USER_ID, done=True)
+
+    def test_workouts_left_today_includes_occurrences(self, mock_db_user_workouts):
+        create_template(recurrence="FREQ=DAILY", start_date="2023-01-01")
+
+        result = Query().resolve_workouts_left_today(None, USER_ID)
+
+        assert len(result) == 1
+        assert result[0]._id is None and result[0].template_id is not None
@@ -0,0 +1,81 @@
+from flask import Blueprint, request, jsonify
+from flask_cors import cross_origin
+from flask_jwt_extended import jwt_required, create_access_token
+import re
+
+from extensions import bcrypt
+from database.clients import LazyDatabase
+
+# MongoDB handles, connected on first use in each worker process
+db = LazyDatabase("workouttracker")
+collection = db["users"]
+
+db_user_workouts = LazyDatabase("user_workouts")
+
+auth = Blueprint("auth", __name__)
+
+def validate_email(email):
+    # Email validation regex pattern
+    pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
+    return re.match(pattern, email)
+
+def validate_password(password):
+    # Password validation criteria (at least 8 characters and at least one uppercase letter, one lowercase letter, one digit and a symbol)
+    pattern = r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$'
+    return re.match(pattern, password)
+
+@auth.route("/login", methods=["POST"])
+@cross_origin()
+def login():
+    username = request.json.get("username", None)
+    password = request.json.get("password", None)
+    
+    user = collection.find_one({"username": username})
+    
+    if not user:
+        return jsonify({"msg": "User not found"}), 404
+    # bcrypt.check_password_hash returns true if password matches
+    if not bcrypt.check_password_hash(user["password"], password):
+        return jsonify({"msg": "Incorrect password"}), 401
+    access_token = create_access_token(identity=username)
+    return jsonify(access_token=access_token), 200 
+
+@auth.route("/signup", methods=["POST"])
+def signup():
+    username = request.json.get("username", None)
+    password = request.json.get("password", None)
+    password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+    email = request.json.get("email", None)
+    
+    # Validate email
+    if not validate_email(email):
+        return jsonify({"msg": "Invalid email format"}), 400
+
+    # Validate password
+    if not validate_password(password):
+        return jsonify({"msg": "Password must be at least 8 characters long and contain at least one uppercase letter, one lowercase letter, and one digit"}), 400
+
+    user = collection.find_one({"username": username})
+    if user:
+        return jsonify({"msg": "Username already exists"}), 409
+    
+    emailIsTaken = collection.find_one({"email": email})
+    if emailIsTaken:
+        return jsonify({"msg": "Email already exists"}), 409
+    
+    # Create a unique collection for the user based on their ID
+    collection.insert_one({"username": username, "password": password_hash, "email": email})
+    
+    user = collection.find_one({"username": username})
+    user_id = f"user_{user['_id']}"
+    
+    db_user_workouts.create_collection(user_id)
+    
+    return jsonify({"msg": "Account successfully created"}), 200
+
+
+@auth.route("/logout", methods=["POST"])
+@jwt_required()
+def logout():
+    # TODO define logout
+    return jsonify({"msg": "Logged out"})
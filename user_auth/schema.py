@@ -1,16 +1,12 @@
 from bson import ObjectId
-import graphene
 from graphene import ObjectType, Field
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from pymongo import MongoClient
-from decouple import config
 
 from .models import User
+from database.clients import LazyDatabase
 
-# Configure MongoDBClient
-client = MongoClient(config('MONGO_URI'))
-
-db = client["workouttracker"]
+# MongoDB handles, connected on first use in each worker process
+db = LazyDatabase("workouttracker")
 collection = db["users"]
 
 ### Available Queries
@@ -21,7 +17,4 @@ class Query(ObjectType):
     def resolve_user(self, info):
         # Gets current user with its jwt identity
         user = collection.find_one({"username": get_jwt_identity()})
-        return User(**user)
-
-### Main entry point for the API
-schema = graphene.Schema(query=Query)
\ No newline at end of file
+        return User(**user)
\ No newline at end of file
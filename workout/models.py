@@ -14,11 +14,47 @@ class Workout(ObjectType):
     done = Boolean()
     comment = String()
     user_id = String()
+    template_id = String()
+    occurrence_date = String()
+    seq = Int()
+    updated_at = String()
+    
+class WorkoutTemplate(ObjectType):
+    _id = String()
+    exercise = Field(Exercise)
+    sets = Int()
+    reps = Int()
+    weight = Int()
+    duration = Int()
+    comment = String()
+    recurrence = String()
+    start_date = String()
+    end_date = String()
+    exdates = List(String)
+    user_id = String()
+    
+class WorkoutEvent(ObjectType):
+    kind = String()
+    workout_id = String()
+    user_id = String()
+    workout = Field(Workout)
     
 class WorkoutPagination(ObjectType):
     workouts = List(Workout)
     num_pages = Int()
     
+class WorkoutChange(ObjectType):
+    kind = String()
+    seq = Int()
+    updated_at = String()
+    workout_id = String()
+    workout = Field(Workout)
+    
+class WorkoutChangesPage(ObjectType):
+    changes = List(WorkoutChange)
+    cursor = Int()
+    has_more = Boolean()
+    
 class TotalReps(ObjectType):
     exercise = Field(Exercise)
     total_reps = Int(default_value=0)
@@ -1,21 +1,24 @@
-from pymongo import MongoClient
-from decouple import config
 from bson import ObjectId
 from graphene import ObjectType, String, Int, Field, List, Boolean
 import graphene
 from dateutil.relativedelta import relativedelta
 import bleach
 from datetime import datetime, timedelta
-
-from .models import Workout, WorkoutPagination, TotalReps, Exercise, MaxDuration, MaxWeight
-
-# Configure MongoDBClient
-client = MongoClient(config('MONGO_URI'))
-
-db = client["workouttracker"]
+from pymongo.errors import DuplicateKeyError
+
+from .models import Workout, WorkoutTemplate, WorkoutEvent, WorkoutPagination, WorkoutChange, WorkoutChangesPage, TotalReps, Exercise, MaxDuration, MaxWeight
+from .templates import parse_recurrence, occurrence_dates, occurrence_workout, expand_templates, ensure_occurrence_index
+from .sync import stamp_write, record_deletion, changes_since
+from exercise.loaders import load_exercise
+from realtime.events import publish_workout_change
+from database.clients import LazyDatabase
+from database.routing import workload, routed, max_time_ms, record_write, TRANSACTIONAL, ANALYTICS
+
+# MongoDB handles, connected on first use in each worker process
+db = LazyDatabase("workouttracker")
 workouts_collection = db["workouts"]
 exercises_collection = db["exercises"]
-db_user_workouts = client["user_workouts"]
+db_user_workouts = LazyDatabase("user_workouts")
 
 ### CreateWorkout Mutation
 class CreateWorkout(graphene.Mutation):
@@ -43,7 +46,7 @@ class CreateWorkout(graphene.Mutation):
         
         user_collection = db_user_workouts[f"user_{user_id}"]
         
-        exercise = exercises_collection.find_one({"_id": ObjectId(exercise_id)})
+        exercise = load_exercise(info, exercises_collection, exercise_id)
         if not exercise:
             raise ValueError(f"Exercise with ID '{exercise_id}' not found")
         
@@ -59,8 +62,13 @@ class CreateWorkout(graphene.Mutation):
             "comment": sanitized_comment
         }
         
-        result = user_collection.insert_one(workout_dict)
+        with stamp_write(db_user_workouts, user_id) as stamp:
+            workout_dict.update(stamp)
+            result = user_collection.insert_one(workout_dict)
         workout_dict["_id"] = result.inserted_id
+        record_write(user_id)
+        
+        publish_workout_change(user_id, "created", result.inserted_id, workout_dict)
 
         workout = Workout(**workout_dict)
         return CreateWorkout(workout=workout)
@@ -78,8 +86,17 @@ class DeleteWorkout(graphene.Mutation):
     def mutate(self, info, workout_id, user_id):
         user_collection = db_user_workouts[f"user_{user_id}"]
         
-        result = user_collection.delete_one({"_id": ObjectId(workout_id)})
-        if result.deleted_count == 1:
+        workout_dict = user_collection.find_one_and_delete({"_id": ObjectId(workout_id)})
+        if workout_dict is not None:
+            # Otherwise the template expands the deleted occurrence again
+            if workout_dict.get("template_id"):
+                db_user_workouts[f"templates_{user_id}"].update_one(
+                    {"_id": ObjectId(workout_dict["template_id"])},
+                    {"$addToSet": {"exdates": workout_dict.get("occurrence_date", workout_dict["date"])}}
+                )
+            record_deletion(db_user_workouts, user_id, workout_id)
+            record_write(user_id)
+            publish_workout_change(user_id, "deleted", workout_id)
             return DeleteWorkout(success=True)
         else:
             return DeleteWorkout(success=False)
@@ -105,7 +122,7 @@ class UpdateWorkout(graphene.Mutation):
     def mutate(self, info, workout_id, exercise_id, user_id, **kwargs):
         user_collection = db_user_workouts[f"user_{user_id}"]
 
-        exercise = exercises_collection.find_one({"_id": ObjectId(exercise_id)})
+        exercise = load_exercise(info, exercises_collection, exercise_id)
 
         if not exercise:
             raise ValueError(f"Exercise with ID '{exercise_id}' not found")
@@ -118,23 +135,189 @@ class UpdateWorkout(graphene.Mutation):
                 sanitized_value = value
             sanitized_kwargs[key] = sanitized_value
 
-        update = {"$set": {"exercise": exercise, **sanitized_kwargs}}
-
-        result = user_collection.update_one({ "_id": ObjectId(workout_id)}, update)
+        with stamp_write(db_user_workouts, user_id) as stamp:
+            update = {"$set": {"exercise": exercise, **sanitized_kwargs, **stamp}}
+            result = user_collection.update_one({ "_id": ObjectId(workout_id)}, update)
 
         if result.modified_count == 1:
+            record_write(user_id)
             workout_dict = user_collection.find_one({"_id": ObjectId(workout_id)})
+            publish_workout_change(user_id, "updated", workout_id, workout_dict)
             workout = Workout(**workout_dict)
             return UpdateWorkout(workout=workout)
         else:
             return UpdateWorkout(workout=None)
         
 
+### CreateWorkoutTemplate Mutation
+class CreateWorkoutTemplate(graphene.Mutation):
+    class Arguments:
+        exercise_id = String(required=True)
+        sets = Int(required=True)
+        reps = Int(required=True)
+        weight = Int()
+        duration = Int()
+        comment = String()
+        recurrence = String(required=True)
+        start_date = String(required=True)
+        end_date = String()
+        user_id = String(required=True)
+    
+    # output of the mutation
+    template = Field(lambda: WorkoutTemplate)
+    
+    ### Create a recurring workout, expanded into occurrences at query time
+    def mutate(self, info, exercise_id, sets, reps, recurrence, start_date, user_id, weight=None, duration=None, comment=None, end_date=None):
+        try:
+            parse_recurrence(recurrence, start_date)
+        except ValueError:
+            raise ValueError(f"Invalid recurrence '{recurrence}' starting on '{start_date}'")
+        
+        exercise = load_exercise(info, exercises_collection, exercise_id)
+        if not exercise:
+            raise ValueError(f"Exercise with ID '{exercise_id}' not found")
+        
+        template_dict = {
+            "exercise": exercise,
+            "sets": sets,
+            "reps": reps,
+            "weight": weight,
+            "duration": duration,
+            "comment": bleach.clean(comment) if comment is not None else '',
+            "recurrence": recurrence,
+            "start_date": start_date,
+            "end_date": end_date,
+            "exdates": [],
+            "user_id": ObjectId(user_id)
+        }
+        
+        result = db_user_workouts[f"templates_{user_id}"].insert_one(template_dict)
+        template_dict["_id"] = result.inserted_id
+        
+        # Lets the expansion find the occurrences already written without a scan
+        ensure_occurrence_index(db_user_workouts, user_id)
+        
+        record_write(user_id)
+        publish_workout_change(user_id, "template_created", result.inserted_id)
+        
+        return CreateWorkoutTemplate(template=WorkoutTemplate(**template_dict))
+    
+
+### DeleteWorkoutTemplate Mutation
+class DeleteWorkoutTemplate(graphene.Mutation):
+    class Arguments:
+        template_id = String(required=True)
+        user_id = String(required=True)
+
+    # output of the mutation
+    success = Boolean()
+    
+    # Occurrences already written to the user collection are kept
+    def mutate(self, info, template_id, user_id):
+        result = db_user_workouts[f"templates_{user_id}"].delete_one({"_id": ObjectId(template_id)})
+        if result.deleted_count == 1:
+            record_write(user_id)
+            publish_workout_change(user_id, "template_deleted", template_id)
+            return DeleteWorkoutTemplate(success=True)
+        else:
+            return DeleteWorkoutTemplate(success=False)
+        
+
+### UpdateWorkoutOccurrence Mutation
+class UpdateWorkoutOccurrence(graphene.Mutation):
+    class Arguments:
+        template_id = String(required=True)
+        date = String(required=True)
+        sets = Int()
+        reps = Int()
+        weight = Int()
+        duration = Int()
+        done = Boolean()
+        comment = String()
+        user_id = String(required=True)
+        
+    # output of the mutation
+    workout = Field(lambda: Workout)
+    
+    ### Write the workout of an occurrence when it is marked done or edited
+    def mutate(self, info, template_id, date, user_id, **kwargs):
+        template = db_user_workouts[f"templates_{user_id}"].find_one({"_id": ObjectId(template_id)})
+        if not template:
+            raise ValueError(f"Workout template with ID '{template_id}' not found")
+        if date not in occurrence_dates(template, date, date):
+            raise ValueError(f"Workout template with ID '{template_id}' does not occur on '{date}'")
+        
+        user_collection = db_user_workouts[f"user_{user_id}"]
+        
+        sanitized_kwargs = {}
+        for key, value in kwargs.items():
+            if key == 'comment':
+                sanitized_value = bleach.clean(value)
+            else:
+                sanitized_value = value
+            sanitized_kwargs[key] = sanitized_value
+        
+        # The template provides the fields that were not given
+        occurrence = {"template_id": template_id, "occurrence_date": date}
+        defaults = {key: value for key, value in occurrence_workout(template, date).items() if key != "_id" and key not in occurrence and key not in sanitized_kwargs}
+        
+        ensure_occurrence_index(db_user_workouts, user_id)
+        with stamp_write(db_user_workouts, user_id) as stamp:
+            update = {"$setOnInsert": defaults, "$set": {**sanitized_kwargs, **stamp}}
+            try:
+                result = user_collection.update_one(occurrence, update, upsert=True)
+            except DuplicateKeyError:
+                # A concurrent update inserted the occurrence first, the unique index kept it
+                # to a single workout and the retry updates it
+                result = user_collection.update_one(occurrence, update, upsert=True)
+        workout_dict = user_collection.find_one(occurrence)
+        
+        record_write(user_id)
+        publish_workout_change(user_id, "created" if result.upserted_id else "updated", workout_dict["_id"], workout_dict)
+        
+        return UpdateWorkoutOccurrence(workout=Workout(**workout_dict))
+    
+
+### DeleteWorkoutOccurrence Mutation
+class DeleteWorkoutOccurrence(graphene.Mutation):
+    class Arguments:
+        template_id = String(required=True)
+        date = String(required=True)
+        user_id = String(required=True)
+
+    # output of the mutation
+    success = Boolean()
+    
+    # Skip a single occurrence of a template
+    def mutate(self, info, template_id, date, user_id):
+        result = db_user_workouts[f"templates_{user_id}"].update_one({"_id": ObjectId(template_id)}, {"$addToSet": {"exdates": date}})
+        if result.matched_count == 1:
+            record_write(user_id)
+            publish_workout_change(user_id, "template_updated", template_id)
+            return DeleteWorkoutOccurrence(success=True)
+        else:
+            return DeleteWorkoutOccurrence(success=False)
+        
+
 ### Available Mutations
 class Mutation(ObjectType):
     create_workout = CreateWorkout.Field()
     update_workout = UpdateWorkout.Field()
     delete_workout = DeleteWorkout.Field()
+    create_workout_template = CreateWorkoutTemplate.Field()
+    delete_workout_template = DeleteWorkoutTemplate.Field()
+    update_workout_occurrence = UpdateWorkoutOccurrence.Field()
+    delete_workout_occurrence = DeleteWorkoutOccurrence.Field()
+    
+
+### Available Subscriptions
+class Subscription(ObjectType):
+    workout_changed = Field(WorkoutEvent, user_id=String(required=True))
+    
+    def resolve_workout_changed(root, info, user_id):
+        # root is the event published by the workout mutations
+        workout = Workout(**root["workout"]) if root.get("workout") else None
+        return WorkoutEvent(kind=root["kind"], workout_id=root["workout_id"], user_id=root["user_id"], workout=workout)
     
 
 ### Available Queries
@@ -162,7 +345,13 @@ class Query(ObjectType):
                             time_range=String())
     workouts_left_today = List(Workout, user_id=String(required=True))
     workouts_left_week = List(Workout, user_id=String(required=True))
+    workout_templates = List(WorkoutTemplate, user_id=String(required=True))
+    workout_changes = Field(WorkoutChangesPage,
+                            user_id=String(required=True),
+                            since=Int(),
+                            limit=Int())
     
+    @workload(TRANSACTIONAL)
     def resolve_workouts(self, info, user_id, date_gte=None, date_lte=None, exercise_id=None, page=None):
         query = {}
         user_collection = db_user_workouts[f"user_{user_id}"]
@@ -180,10 +369,10 @@ class Query(ObjectType):
         
         # Count number of pages
         page_size = 12
-        total_workouts = user_collection.count_documents(query)
+        total_workouts = user_collection.count_documents(query, maxTimeMS=max_time_ms())
         num_pages = (total_workouts // page_size) + (total_workouts % page_size > 0)
 
-        workouts_cursor = user_collection.find(query)
+        workouts_cursor = user_collection.find(query, max_time_ms=max_time_ms())
         
         if page:
             skip = page_size * (page - 1)
@@ -197,6 +386,7 @@ class Query(ObjectType):
         return WorkoutPagination(workouts=workouts, num_pages=num_pages)
 
     
+    @workload(TRANSACTIONAL)
     def resolve_workouts_left_today(self, info, user_id):
         user_collection = db_user_workouts[f"user_{user_id}"]
         
@@ -204,11 +394,16 @@ class Query(ObjectType):
         query = {"user_id": ObjectId(user_id), "date": today, "done": False}
         workouts = []
 
-        for workout in user_collection.find(query):
+        for workout in user_collection.find(query, max_time_ms=max_time_ms()):
+            workouts.append(Workout(**workout))
+        
+        # Occurrences of recurring workouts are not stored until done or edited
+        for workout in expand_templates(db_user_workouts[f"templates_{user_id}"], user_collection, today, today):
             workouts.append(Workout(**workout))
 
         return workouts
 
+    @workload(TRANSACTIONAL)
     def resolve_workouts_left_week(self, info, user_id):
         user_collection = db_user_workouts[f"user_{user_id}"]
         
@@ -219,11 +414,54 @@ class Query(ObjectType):
         query = {"user_id": ObjectId(user_id), "date": {"$gte": start_date.strftime("%Y-%m-%d"), "$lte": end_date.strftime("%Y-%m-%d")}, "done": False}
         workouts = []
 
-        for workout in user_collection.find(query):
+        for workout in user_collection.find(query, max_time_ms=max_time_ms()):
+            workouts.append(Workout(**workout))
+        
+        # Occurrences of recurring workouts are not stored until done or edited
+        for workout in expand_templates(db_user_workouts[f"templates_{user_id}"], user_collection, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")):
             workouts.append(Workout(**workout))
 
         return workouts
     
+    @workload(TRANSACTIONAL)
+    def resolve_workout_templates(self, info, user_id):
+        templates = []
+        
+        for template in db_user_workouts[f"templates_{user_id}"].find(max_time_ms=max_time_ms()):
+            templates.append(WorkoutTemplate(**template))
+            
+        return templates
+    
+    @workload(TRANSACTIONAL)
+    def resolve_workout_changes(self, info, user_id, since=0, limit=100):
+        """
+        Retrieves the workouts written and deleted since a client last synced.
+
+        Parameters:
+            info (Info): The GraphQL information object.
+            user_id (str): The ID of the user.
+            since (int, optional): The cursor of the previous page, 0 to sync the whole history. Defaults to 0.
+            limit (int, optional): The maximum number of changes, at most 500. Defaults to 100.
+
+        Returns:
+            WorkoutChangesPage: The changes, oldest first, and the cursor of the next page.
+        """
+        limit = max(1, min(limit, 500))
+        changes, cursor, has_more = changes_since(db_user_workouts, user_id, since or 0, limit)
+        
+        workout_changes = []
+        for kind, doc in changes:
+            workout_changes.append(WorkoutChange(
+                kind=kind,
+                seq=doc["seq"],
+                updated_at=doc["updated_at"],
+                workout_id=str(doc["_id"]),
+                workout=Workout(**doc) if kind == "upsert" else None
+            ))
+            
+        return WorkoutChangesPage(changes=workout_changes, cursor=cursor, has_more=has_more)
+    
+    @workload(ANALYTICS)
     def resolve_total_reps(self, info, user_id, exercise_id=None, time_range=None):
         """
         Calculate and return the total number of repetitions for a user's workouts.
@@ -265,7 +503,8 @@ class Query(ObjectType):
         # Sort stage to order by max_duration
         pipeline.append({"$sort": {"total_reps": -1}})
         
-        result = db_user_workouts[f"user_{user_id}"].aggregate(pipeline)
+        # Aggregations may run on a secondary, within the analytics time budget
+        result = routed(db_user_workouts[f"user_{user_id}"], user_id).aggregate(pipeline, maxTimeMS=max_time_ms())
         
         total_reps = []
         for doc in result:
@@ -274,6 +513,7 @@ class Query(ObjectType):
             
         return total_reps
 
+    @workload(ANALYTICS)
     def resolve_max_duration(self, info, user_id, exercise_id=None, time_range=None):
         """
         Retrieves the maximum duration for each exercise completed by a user within a specified time range and/or exercise ID.
@@ -315,7 +555,8 @@ class Query(ObjectType):
         # Sort stage to order by max_duration
         pipeline.append({"$sort": {"max_duration": -1}})
         
-        result = db_user_workouts[f"user_{user_id}"].aggregate(pipeline)
+        # Aggregations may run on a secondary, within the analytics time budget
+        result = routed(db_user_workouts[f"user_{user_id}"], user_id).aggregate(pipeline, maxTimeMS=max_time_ms())
         
         max_durations = []
         for doc in result:
@@ -324,6 +565,7 @@ class Query(ObjectType):
             
         return max_durations
 
+    @workload(ANALYTICS)
     def resolve_max_weight(self, info, user_id, exercise_id=None, time_range=None):
         """
         Retrieves the maximum weight for each exercise completed by a user within a specified time range and/or exercise ID.
@@ -365,15 +607,12 @@ class Query(ObjectType):
         # Sort stage to order by max_duration
         pipeline.append({"$sort": {"max_weight": -1}})
         
-        result = db_user_workouts[f"user_{user_id}"].aggregate(pipeline)
+        # Aggregations may run on a secondary, within the analytics time budget
+        result = routed(db_user_workouts[f"user_{user_id}"], user_id).aggregate(pipeline, maxTimeMS=max_time_ms())
         
         max_weights = []
         for doc in result:
             if doc["max_weight"]:
                 max_weights.append(MaxWeight(exercise=doc["_id"], max_weight=doc["max_weight"]))
             
-        return max_weights
-
-
-### Main entry point for the API
-schema = graphene.Schema(query=Query, mutation=Mutation)
\ No newline at end of file
+        return max_weights
\ No newline at end of file
@@ -0,0 +1,273 @@
+"""
+The change feed of the user workouts.
+
+Workouts written before the feed existed have no sequence number and are not returned
+until they are backfilled, once after deploying:
+
+Usage:
+    python -m workout.sync backfill [--user USER_ID] [--batch-size N]
+"""
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import heapq
+import logging
+import threading
+
+from bson import ObjectId
+from decouple import config
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+from database.clients import LazyDatabase
+
+logger = logging.getLogger(__name__)
+
+# Collection of the per-user change counters and of their writes in flight, in the user workouts database
+COUNTERS_COLLECTION = "sync_counters"
+# Seconds after which a write in flight is considered dead, e.g. its worker crashed
+PENDING_TIMEOUT = config('SYNC_PENDING_TIMEOUT', default=30, cast=float)
+
+# Users whose sync indexes were created by this process
+_indexed_users = set()
+_indexed_lock = threading.Lock()
+# Highest sequence number this process saw for each user, a floor for its next writes
+_seen_seqs = {}
+
+
+def tombstones_collection(db_user_workouts, user_id):
+    return db_user_workouts[f"tombstones_{user_id}"]
+
+
+def ensure_sync_indexes(db_user_workouts, user_id):
+    """Create the indexes the change feed of a user reads from, once per process."""
+    user_id = str(user_id)
+    if user_id in _indexed_users:
+        return
+    # Not sparse, so that the workouts written before sequencing can be found by {"seq": None}
+    db_user_workouts[f"user_{user_id}"].create_index([("seq", ASCENDING)])
+    tombstones_collection(db_user_workouts, user_id).create_index([("seq", ASCENDING)])
+    with _indexed_lock:
+        _indexed_users.add(user_id)
+
+
+def next_seq(db_user_workouts, user_id):
+    """
+    Allocate the next change sequence number of a user.
+
+    Parameters:
+        db_user_workouts (Database): The user workouts database.
+        user_id (str): The ID of the user.
+
+    Returns:
+        int: A number greater than any allocated before for this user.
+    """
+    counter = db_user_workouts[COUNTERS_COLLECTION].find_one_and_update(
+        {"_id": str(user_id)},
+        {"$inc": {"seq": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter["seq"]
+
+
+def current_seq(db_user_workouts, user_id):
+    counter = db_user_workouts[COUNTERS_COLLECTION].find_one({"_id": str(user_id)})
+    return counter["seq"] if counter else 0
+
+
+@contextmanager
+def stamp_write(db_user_workouts, user_id, count=1):
+    """
+    Get the fields every write of a workout sets, so that it shows up in the change feed.
+
+    The sequence number is allocated before the write commits, so concurrent writes of a
+    user, e.g. from two devices, can become visible out of order. The write is registered
+    as pending in the same update of the counter that allocates its number, with a floor
+    below it, and changes_since does not return changes above the floor of a pending write
+    until it completes. A write costs two round trips besides its own: the allocation and
+    the release.
+
+    Usage:
+        with stamp_write(db_user_workouts, user_id) as stamp:
+            user_collection.insert_one({**workout, **stamp})
+
+    Parameters:
+        db_user_workouts (Database): The user workouts database.
+        user_id (str): The ID of the user.
+        count (int, optional): The number of sequence numbers to reserve, the stamp holds the first. Defaults to 1.
+
+    Returns:
+        dict: The "seq" and "updated_at" fields.
+    """
+    user_id = str(user_id)
+    ensure_sync_indexes(db_user_workouts, user_id)
+    counters = db_user_workouts[COUNTERS_COLLECTION]
+    now = datetime.now(timezone.utc)
+    # Any number seen before is below the numbers allocated next, a stale one only holds
+    # back more of the feed while the write is in flight
+    floor = _seen_seqs.get(user_id)
+    if floor is None:
+        floor = current_seq(db_user_workouts, user_id)
+
+    write_id = ObjectId()
+    counter = counters.find_one_and_update(
+        {"_id": user_id},
+        {
+            "$inc": {"seq": count},
+            "$push": {"pending": {"_id": write_id, "floor": floor, "expires_at": now + timedelta(seconds=PENDING_TIMEOUT)}}
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _seen_seqs[user_id] = counter["seq"]
+    try:
+        yield {
+            "seq": counter["seq"] - count + 1,
+            "updated_at": now.isoformat(timespec="milliseconds")
+        }
+    finally:
+        counters.update_one({"_id": user_id}, {"$pull": {"pending": {"_id": write_id}}})
+        # Rarely any, a worker crashed in the middle of a write
+        if any(expired(write, now) for write in counter["pending"]):
+            counters.update_one({"_id": user_id}, {"$pull": {"pending": {"expires_at": {"$lt": now}}}})
+
+
+def expired(write, now):
+    expires_at = write["expires_at"]
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at <= now
+
+
+def visible_seq(db_user_workouts, user_id):
+    """
+    Get the highest sequence number below which every change of a user is visible.
+
+    Returns:
+        int: The low watermark of the change feed.
+    """
+    # The counter and the writes it allocated numbers to are read at once
+    counter = db_user_workouts[COUNTERS_COLLECTION].find_one({"_id": str(user_id)})
+    if not counter:
+        return 0
+    watermark = counter["seq"]
+    now = datetime.now(timezone.utc)
+    for write in counter.get("pending", []):
+        # Dead writes are dropped by the next write, skip them meanwhile
+        if not expired(write, now):
+            watermark = min(watermark, write["floor"])
+    return watermark
+
+
+def record_deletion(db_user_workouts, user_id, workout_id):
+    """
+    Leave a tombstone for a deleted workout, so that clients that synced it learn of the deletion.
+
+    Parameters:
+        db_user_workouts (Database): The user workouts database.
+        user_id (str): The ID of the user.
+        workout_id (str): The ID of the deleted workout.
+    """
+    with stamp_write(db_user_workouts, user_id) as stamp:
+        tombstones_collection(db_user_workouts, user_id).update_one(
+            {"_id": ObjectId(workout_id)},
+            {"$set": stamp},
+            upsert=True
+        )
+
+
+def backfill_seq(db_user_workouts, user_id, batch_size=1000):
+    """
+    Sequence the workouts written before the change feed existed, in insertion order.
+
+    Each batch reserves its sequence numbers under a single pending write and stamps its
+    workouts with one bulk write.
+
+    Parameters:
+        db_user_workouts (Database): The user workouts database.
+        user_id (str): The ID of the user.
+        batch_size (int, optional): The number of workouts stamped per bulk write. Defaults to 1000.
+
+    Returns:
+        int: The number of workouts sequenced.
+    """
+    user_collection = db_user_workouts[f"user_{user_id}"]
+    count = 0
+    while True:
+        workout_ids = [workout["_id"] for workout in user_collection.find({"seq": None}, {"_id": 1}).sort("_id", ASCENDING).limit(batch_size)]
+        if not workout_ids:
+            return count
+        with stamp_write(db_user_workouts, user_id, len(workout_ids)) as stamp:
+            # A workout written meanwhile keeps its own number, the one reserved for it is skipped
+            result = user_collection.bulk_write([
+                UpdateOne({"_id": workout_id, "seq": None}, {"$set": {"seq": stamp["seq"] + position, "updated_at": stamp["updated_at"]}})
+                for position, workout_id in enumerate(workout_ids)
+            ], ordered=False)
+        count += result.modified_count
+
+
+def changes_since(db_user_workouts, user_id, since=0, limit=100):
+    """
+    Get the workouts written and deleted after a cursor, oldest change first.
+
+    Both collections are read through their seq index, so the work done scales
+    with the number of changes returned rather than with the history of the user.
+    Changes above the floor of a write still in flight are held back, so that the
+    cursor never moves past a sequence number that is not visible yet.
+
+    Parameters:
+        db_user_workouts (Database): The user workouts database.
+        user_id (str): The ID of the user.
+        since (int, optional): The cursor returned by the previous page, 0 for a full sync. Defaults to 0.
+        limit (int, optional): The maximum number of changes. Defaults to 100.
+
+    Returns:
+        tuple: The changes as ("upsert", workout) or ("delete", tombstone) pairs, the
+            cursor to pass for the next page, and whether more changes are pending.
+    """
+    ensure_sync_indexes(db_user_workouts, user_id)
+
+    query = {"seq": {"$gt": since, "$lte": visible_seq(db_user_workouts, user_id)}}
+    # One more than the limit tells whether another page follows
+    workouts = db_user_workouts[f"user_{user_id}"].find(query).sort("seq", ASCENDING).limit(limit + 1)
+    tombstones = tombstones_collection(db_user_workouts, user_id).find(query).sort("seq", ASCENDING).limit(limit + 1)
+
+    merged = heapq.merge(
+        (("upsert", workout) for workout in workouts),
+        (("delete", tombstone) for tombstone in tombstones),
+        key=lambda change: change[1]["seq"]
+    )
+    changes = []
+    for change in merged:
+        changes.append(change)
+        if len(changes) > limit:
+            break
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    cursor = changes[-1][1]["seq"] if changes else since
+    return changes, cursor, has_more
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequence the workouts written before the change feed existed.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--user", help="the ID of a single user, all users by default")
+    parser.add_argument("--batch-size", type=int, default=1000, help="workouts stamped per bulk write")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db_user_workouts = LazyDatabase("user_workouts")
+    if args.user:
+        user_ids = [args.user]
+    else:
+        user_ids = [name[len("user_"):] for name in db_user_workouts.list_collection_names() if name.startswith("user_")]
+
+    for user_id in user_ids:
+        count = backfill_seq(db_user_workouts, user_id, args.batch_size)
+        if count:
+            logger.info("Sequenced %d workouts of user %s", count, user_id)
+
+
+if __name__ == "__main__":
+    main()
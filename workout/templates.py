@@ -0,0 +1,131 @@
+from datetime import datetime
+import threading
+
+from dateutil.rrule import rrulestr
+from pymongo import ASCENDING
+
+# Users whose occurrence index was created by this process
+_indexed_users = set()
+_indexed_lock = threading.Lock()
+
+
+def parse_recurrence(recurrence, start_date):
+    """
+    Parse the recurrence rule of a workout template.
+
+    Parameters:
+        recurrence (str): An iCalendar RRULE, e.g. "FREQ=WEEKLY;BYDAY=MO,WE,FR".
+        start_date (str): The date of the first occurrence, formatted as "%Y-%m-%d".
+
+    Returns:
+        rrule: The recurrence rule. Raises ValueError if the rule or the date is invalid.
+    """
+    return rrulestr(recurrence, dtstart=datetime.strptime(start_date, "%Y-%m-%d"))
+
+
+def occurrence_dates(template, date_gte, date_lte):
+    """
+    Get the dates a workout template occurs on within a date range.
+
+    Parameters:
+        template (dict): The template document.
+        date_gte (str): The first date of the range, formatted as "%Y-%m-%d".
+        date_lte (str): The last date of the range, formatted as "%Y-%m-%d".
+
+    Returns:
+        List[str]: The dates formatted as "%Y-%m-%d", without the skipped ones.
+    """
+    if template.get("end_date") and template["end_date"] < date_lte:
+        date_lte = template["end_date"]
+    if date_gte > date_lte:
+        return []
+
+    rule = parse_recurrence(template["recurrence"], template["start_date"])
+    skipped = set(template.get("exdates") or [])
+    dates = rule.between(
+        datetime.strptime(date_gte, "%Y-%m-%d"),
+        datetime.strptime(date_lte, "%Y-%m-%d"),
+        inc=True
+    )
+    return [date.strftime("%Y-%m-%d") for date in dates if date.strftime("%Y-%m-%d") not in skipped]
+
+
+def ensure_occurrence_index(db_user_workouts, user_id):
+    """
+    Create the index of the occurrences written to the user collection, once per process.
+
+    It is unique, so that concurrent writes of the same occurrence cannot both insert a
+    workout, and partial, so that the workouts not created from a template are left out.
+    """
+    user_id = str(user_id)
+    if user_id in _indexed_users:
+        return
+    db_user_workouts[f"user_{user_id}"].create_index(
+        [("template_id", ASCENDING), ("occurrence_date", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"template_id": {"$exists": True}}
+    )
+    with _indexed_lock:
+        _indexed_users.add(user_id)
+
+
+def occurrence_workout(template, date):
+    """Build the workout a template occurrence stands for, until it is written to the user collection."""
+    return {
+        "_id": None,
+        "exercise": template["exercise"],
+        "sets": template["sets"],
+        "reps": template["reps"],
+        "weight": template.get("weight"),
+        "duration": template.get("duration"),
+        "date": date,
+        # Kept when the workout is moved to another date, it is the occurrence it stands for
+        "occurrence_date": date,
+        "done": False,
+        "comment": template.get("comment", ""),
+        "user_id": template["user_id"],
+        "template_id": str(template["_id"])
+    }
+
+
+def expand_templates(templates_collection, user_collection, date_gte, date_lte):
+    """
+    Expand the workout templates of a user into the occurrences left to do within a date range.
+
+    Occurrences the user already marked done or edited have a concrete workout document
+    in the user collection, and are left out.
+
+    Parameters:
+        templates_collection (Collection): The user's templates collection.
+        user_collection (Collection): The user's workouts collection.
+        date_gte (str): The first date of the range, formatted as "%Y-%m-%d".
+        date_lte (str): The last date of the range, formatted as "%Y-%m-%d".
+
+    Returns:
+        List[dict]: The workouts of the pending occurrences, ordered by date.
+    """
+    templates = list(templates_collection.find({
+        "start_date": {"$lte": date_lte},
+        "$or": [{"end_date": None}, {"end_date": {"$gte": date_gte}}]
+    }))
+    if not templates:
+        return []
+
+    # Occurrences written to the user collection, served by the (template_id, occurrence_date) index.
+    # They are matched on the date they occurred on, so that a workout moved to another date
+    # does not bring its occurrence back
+    materialized = {
+        (workout["template_id"], workout["occurrence_date"])
+        for workout in user_collection.find(
+            {"template_id": {"$in": [str(template["_id"]) for template in templates]}, "occurrence_date": {"$gte": date_gte, "$lte": date_lte}},
+            {"template_id": 1, "occurrence_date": 1}
+        )
+    }
+
+    workouts = []
+    for template in templates:
+        for date in occurrence_dates(template, date_gte, date_lte):
+            if (str(template["_id"]), date) not in materialized:
+                workouts.append(occurrence_workout(template, date))
+    workouts.sort(key=lambda workout: workout["date"])
+    return workouts